@@ -1,8 +1,12 @@
 import streamlit as st
 import requests
 import urllib.parse
+import json
+import pandas as pd
 
 BACKEND_URL = "https://ai-college-chatbot-backend.onrender.com" 
+NEXT_CURSOR_HEADER = "X-Next-Cursor" # Set by paginated list endpoints when more rows follow
+CHAT_HISTORY_PAGE_SIZE = 50
 
 st.markdown("""
 <style>
@@ -83,16 +87,16 @@ def login_user(username, password):
                 st.session_state['user_role'] = 'user' 
                 st.session_state['user_name'] = 'user'
             
-            history_response = requests.get(
-                f"{BACKEND_URL}/chat/history",
-                headers=headers 
-            )
+            # Only the latest messages; older ones are loaded on request
+            history_response = fetch_page("/chat/history", headers, limit=CHAT_HISTORY_PAGE_SIZE)
             if history_response.status_code == 200:
                 history_data = history_response.json()
                 st.session_state['chat_history'] = [{"user": row['message'], "bot": row['response']} for row in history_data]
+                st.session_state['chat_history_cursor'] = history_response.headers.get(NEXT_CURSOR_HEADER)
             else:
                 print(f"Error fetching chat history: {history_response.status_code}")
                 st.session_state['chat_history'] = []
+                st.session_state['chat_history_cursor'] = None
 
             st.rerun() 
         else:
@@ -104,12 +108,68 @@ def login_user(username, password):
 
 def logout_user():
     """Logs out the user by clearing the session state."""
-    keys_to_clear = ['logged_in', 'access_token', 'user_role', 'user_name', 'chat_history']
+    keys_to_clear = ['logged_in', 'access_token', 'user_role', 'user_name', 'chat_history', 'chat_history_cursor']
+    keys_to_clear += [key for key in st.session_state if key.endswith('_list')] # Cached paginated lists
     for key in keys_to_clear:
         if key in st.session_state:
             del st.session_state[key]
     st.rerun()
 
+def fetch_page(path, headers, cursor=None, **params):
+    """Requests one page of a paginated list endpoint; empty filters are left out."""
+    params = {key: value for key, value in params.items() if value not in (None, "")}
+    if cursor is not None:
+        params["cursor"] = cursor
+    return requests.get(f"{BACKEND_URL}{path}", headers=headers, params=params)
+
+def fetch_all_pages(path, headers, **params):
+    """Every row of a paginated list (for dropdowns), or None if a request fails."""
+    rows, cursor = [], None
+    while True:
+        response = fetch_page(path, headers, cursor=cursor, limit=500, **params)
+        if response.status_code != 200:
+            return None
+        rows.extend(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return rows
+
+def lazy_list(state_key, path, headers, **filters):
+    """
+    Rows of a paginated list loaded so far, kept in session state. The first page
+    is fetched when the list is first shown or its filters change; more pages are
+    added by load_more_button(). Returns (state, None), or (None, response) on error.
+    """
+    state = st.session_state.get(state_key)
+    if state is None or state["filters"] != filters:
+        response = fetch_page(path, headers, **filters)
+        if response.status_code != 200:
+            return None, response
+        state = {"filters": filters, "rows": response.json(), "cursor": response.headers.get(NEXT_CURSOR_HEADER)}
+        st.session_state[state_key] = state
+    return state, None
+
+def load_more_button(state_key, path, headers):
+    state = st.session_state.get(state_key)
+    if state and state["cursor"] and st.button("Load more", key=f"{state_key}_more"):
+        response = fetch_page(path, headers, cursor=state["cursor"], **state["filters"])
+        if response.status_code == 200:
+            state["rows"].extend(response.json())
+            state["cursor"] = response.headers.get(NEXT_CURSOR_HEADER)
+            st.rerun()
+        else:
+            st.error(f"Failed to load more: {response.text}")
+
+def load_older_chat_history(headers):
+    """Prepends the previous page of chat history."""
+    response = fetch_page("/chat/history", headers, cursor=st.session_state.get('chat_history_cursor'), limit=CHAT_HISTORY_PAGE_SIZE)
+    if response.status_code == 200:
+        older = [{"user": row['message'], "bot": row['response']} for row in response.json()]
+        st.session_state['chat_history'] = older + st.session_state['chat_history']
+        st.session_state['chat_history_cursor'] = response.headers.get(NEXT_CURSOR_HEADER)
+    else:
+        st.error(f"Failed to load older messages: {response.text}")
+
 def get_chat_response(message):
     """Sends a message to the chat API and gets a response."""
     if 'access_token' not in st.session_state:
@@ -134,6 +194,46 @@ def get_chat_response(message):
         st.error(f"An error occurred while chatting: {e}")
         return None
 
+def iter_sse_events(response):
+    """Parses a Server-Sent Events response into (event, data) pairs."""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):])
+
+def stream_chat_response(message):
+    """
+    Sends a message to the streaming chat API and yields the reply text
+    chunk by chunk as Server-Sent Events arrive.
+    """
+    if 'access_token' not in st.session_state:
+        st.error("You are not logged in.")
+        return
+    
+    token = f"Bearer {st.session_state['access_token']}"
+    headers = {"Authorization": token, "Accept": "text/event-stream"}
+    
+    try:
+        with requests.post(
+            f"{BACKEND_URL}/chat/stream",
+            json={"message": message},
+            headers=headers,
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                st.error(f"Error from chat API: {response.text}")
+                return
+            for event, data in iter_sse_events(response):
+                if event == "delta":
+                    yield data['text']
+                elif event == "error":
+                    st.error(f"Error from chat API: {data.get('detail', 'Unknown error')}")
+                    return
+    except Exception as e:
+        st.error(f"An error occurred while chatting: {e}")
+
 # --- Main App Logic ---
 
 st.set_page_config(page_title="Brindavan Group of Institutions",page_icon="🎓", layout="wide") 
@@ -231,6 +331,10 @@ else:
 
     if page == "Chatbot":
         st.title("College AI Chatbot 🤖")
+
+        if st.session_state.get('chat_history_cursor') and st.button("Load older messages"):
+            load_older_chat_history(headers)
+            st.rerun()
         
         for chat in st.session_state.chat_history:
             with st.chat_message("user"):
@@ -243,7 +347,9 @@ else:
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            bot_response = get_chat_response(prompt)
+            # Render the reply as it streams in
+            with st.chat_message("assistant"):
+                bot_response = st.write_stream(stream_chat_response(prompt))
             
             if bot_response:
                 st.session_state.chat_history[-1]['bot'] = bot_response
@@ -329,9 +435,8 @@ else:
         st.title("👨‍🏫 Instructor Schedules")
         instructors = []
         try:
-            courses_resp = requests.get(f"{BACKEND_URL}/courses", headers=headers)
-            if courses_resp.status_code == 200:
-                courses = courses_resp.json()
+            courses = fetch_all_pages("/courses", headers)
+            if courses is not None:
                 instructors = sorted(list(set(c['instructor'] for c in courses))) 
             else:
                  st.error("Could not fetch instructor list.")
@@ -384,19 +489,23 @@ else:
                         new_course_data = {"name": new_name, "description": new_desc, "instructor": new_instructor}
                         try:
                             response = requests.post(f"{BACKEND_URL}/courses", json=new_course_data, headers=headers)
-                            if response.status_code == 200: st.success("Course added successfully!"); st.rerun()
+                            if response.status_code == 200:
+                                st.session_state.pop('courses_list', None)
+                                st.success("Course added successfully!"); st.rerun()
                             else: st.error(f"Failed to add course: {response.text}")
                         except Exception as e: st.error(f"Error adding course: {e}")
 
         with st.expander("✍️ Enter/Update Internal Marks"):
             try:
              # Fetch students and courses for dropdowns
-                students_resp = requests.get(f"{BACKEND_URL}/students", headers=headers)
-                courses_resp = requests.get(f"{BACKEND_URL}/courses", headers=headers)
+                student_filter = st.text_input("Filter students by name", key="mark_student_filter")
+                students_resp = fetch_page("/students", headers, name=student_filter)
+                courses = fetch_all_pages("/courses", headers)
 
-                if students_resp.status_code == 200 and courses_resp.status_code == 200:
+                if students_resp.status_code == 200 and courses is not None:
                     students = students_resp.json()
-                    courses = courses_resp.json()
+                    if students_resp.headers.get(NEXT_CURSOR_HEADER):
+                        st.caption("Showing the first matching students; type more of a name to narrow the list.")
 
                     student_options = {s['name']: s['id'] for s in students}
                     course_options = {c['name']: c['id'] for c in courses}
@@ -441,11 +550,30 @@ else:
             except Exception as e:
                 st.error(f"Error loading data for marks form: {e}")
 
+            st.write("Or upload many marks at once as a CSV with columns student_id, course_id, internal_1, internal_2, internal_3.")
+            marks_file = st.file_uploader("Marks CSV", type=["csv"], key="marks_csv")
+            if marks_file is not None and st.button("Import Marks CSV"):
+                try:
+                    response = requests.post(
+                        f"{BACKEND_URL}/marks/internal/bulk",
+                        data=marks_file.getvalue(),
+                        headers={**headers, "Content-Type": "text/csv"}
+                    )
+                    if response.status_code == 200:
+                        result = response.json()
+                        st.success(f"Imported {result['imported']} of {result['received']} rows.")
+                        if result['errors']:
+                            st.warning("Some rows were not imported:")
+                            st.dataframe(result['errors'], use_container_width=True)
+                    else:
+                        st.error(f"Failed to import marks: {response.text}")
+                except Exception as e:
+                    st.error(f"Error importing marks: {e}")
+
         with st.expander("🗓️ Add Course Schedule Entry"):
             try:
-                courses_resp = requests.get(f"{BACKEND_URL}/courses", headers=headers)
-                if courses_resp.status_code == 200:
-                    courses = courses_resp.json()
+                courses = fetch_all_pages("/courses", headers)
+                if courses is not None:
                     course_options = {c['name']: c['id'] for c in courses}
                     with st.form("add_schedule_form", clear_on_submit=True):
                         selected_course_name = st.selectbox("Select Course for Schedule", options=course_options.keys(), key="sched_course")
@@ -470,10 +598,11 @@ else:
 
         st.divider()
         st.subheader("Existing Courses")
+        course_filter = st.text_input("Filter courses by name", key="course_list_filter")
         try:
-            response = requests.get(f"{BACKEND_URL}/courses", headers=headers)
-            if response.status_code == 200:
-                courses = response.json()
+            courses_page, response = lazy_list("courses_list", "/courses", headers, name=course_filter)
+            if courses_page is not None:
+                courses = courses_page["rows"]
                 if courses:
                     display_data = [{"id": c['id'], "name": c['name'], "description": c['description'], "instructor": c['instructor']} for c in courses]
                     cols = st.columns((1, 2, 3, 2, 1.5, 1.5))
@@ -499,15 +628,20 @@ else:
                                          updated_course_data = {"name": edit_name, "description": edit_desc, "instructor": edit_instructor}
                                          try:
                                              edit_response = requests.put(f"{BACKEND_URL}/courses/{row_key}", json=updated_course_data, headers=headers)
-                                             if edit_response.status_code == 200: st.success(f"Course {row_key} updated."); st.rerun()
+                                             if edit_response.status_code == 200:
+                                                 st.session_state.pop('courses_list', None)
+                                                 st.success(f"Course {row_key} updated."); st.rerun()
                                              else: st.error(f"Failed to update course: {edit_response.text}")
                                          except Exception as e: st.error(f"Error updating course: {e}")
                         if cols[5].button("🗑️", key=f"delete_{row_key}"):
                             try:
                                 delete_response = requests.delete(f"{BACKEND_URL}/courses/{row_key}", headers=headers)
-                                if delete_response.status_code == 200: st.success(f"Course {row_key} deleted."); st.rerun()
+                                if delete_response.status_code == 200:
+                                    st.session_state.pop('courses_list', None)
+                                    st.success(f"Course {row_key} deleted."); st.rerun()
                                 else: st.error(f"Failed to delete course: {delete_response.text}")
                             except Exception as e: st.error(f"Error deleting course: {e}")
+                    load_more_button("courses_list", "/courses", headers)
                 else: st.write("No courses found.")
             else: st.error(f"Failed to fetch courses: {response.text}")
         except Exception as e: st.error(f"An error occurred fetching courses: {e}")
@@ -517,10 +651,13 @@ else:
         
         with st.expander("✅ Enroll Student in Course"):
             try:
-                students_resp = requests.get(f"{BACKEND_URL}/students", headers=headers)
-                courses_resp = requests.get(f"{BACKEND_URL}/courses", headers=headers)
-                if students_resp.status_code == 200 and courses_resp.status_code == 200:
-                    students = students_resp.json(); courses = courses_resp.json()
+                student_filter = st.text_input("Filter students by name", key="enroll_student_filter")
+                students_resp = fetch_page("/students", headers, name=student_filter)
+                courses = fetch_all_pages("/courses", headers)
+                if students_resp.status_code == 200 and courses is not None:
+                    students = students_resp.json()
+                    if students_resp.headers.get(NEXT_CURSOR_HEADER):
+                        st.caption("Showing the first matching students; type more of a name to narrow the list.")
                     student_options = {s['name']: s['id'] for s in students}
                     course_options = {c['name']: c['id'] for c in courses}
                     with st.form("enroll_student_form", clear_on_submit=True):
@@ -541,13 +678,74 @@ else:
                                 except Exception as e: st.error(f"Error enrolling student: {e}")
                 else: st.error("Could not load students or courses for enrollment form.")
             except Exception as e: st.error(f"Error loading data for enrollment form: {e}")
+
+            st.write("Or upload a CSV with columns student_id, course_id to enroll many students at once.")
+            enroll_file = st.file_uploader("Enrollments CSV", type=["csv"], key="enroll_csv")
+            if enroll_file is not None and st.button("Import Enrollments CSV"):
+                try:
+                    enroll_rows = pd.read_csv(enroll_file)
+                    pairs = [
+                        {"student_id": int(row.student_id), "course_id": int(row.course_id)}
+                        for row in enroll_rows.itertuples(index=False)
+                    ]
+                    response = requests.post(f"{BACKEND_URL}/enrollments/bulk", json={"pairs": pairs}, headers=headers)
+                    if response.status_code == 200:
+                        result = response.json()
+                        st.success(f"Enrolled {len(result['enrolled'])} new student-course pairs.")
+                        if result['already_enrolled']:
+                            st.info(f"{len(result['already_enrolled'])} pairs were already enrolled.")
+                        if result['invalid']:
+                            st.warning("These pairs have an unknown student or course ID:")
+                            st.dataframe(result['invalid'], use_container_width=True)
+                    else: st.error(f"Failed to import enrollments: {response.text}")
+                except Exception as e: st.error(f"Error importing enrollments: {e}")
         
+        with st.expander("🧾 Generate AI Summaries for a Course"):
+            try:
+                courses = fetch_all_pages("/courses", headers)
+                if courses is not None:
+                    course_options = {c['name']: c['id'] for c in courses}
+                    selected_course_name = st.selectbox("Select Course to Summarise", options=course_options.keys(), key="summary_course")
+                    if st.button("Generate Summaries") and selected_course_name:
+                        job_resp = requests.post(
+                            f"{BACKEND_URL}/reports/student-summaries",
+                            json={"course_id": course_options[selected_course_name]},
+                            headers=headers
+                        )
+                        if job_resp.status_code == 200:
+                            job = job_resp.json()
+                            progress = st.progress(0.0, text=f"Summarising {job['total']} students...")
+                            completed = 0
+                            # Results arrive as each student's summary completes
+                            with requests.get(
+                                f"{BACKEND_URL}/reports/student-summaries/{job['job_id']}/stream",
+                                headers=headers,
+                                stream=True
+                            ) as stream_resp:
+                                for event, data in iter_sse_events(stream_resp):
+                                    if event == "result":
+                                        completed += 1
+                                        progress.progress(completed / job['total'], text=f"{completed} / {job['total']} done")
+                                        if data.get("summary"):
+                                            st.session_state[f"summary_for_{data['student_id']}"] = data['summary']
+                                            st.markdown(f"**{data['name']}**")
+                                            st.info(data['summary'])
+                                        else:
+                                            st.error(f"{data.get('name', data['student_id'])}: {data.get('error')}")
+                                    elif event == "done" and data.get("error"):
+                                        st.error(f"Summary job failed: {data['error']}")
+                        else:
+                            st.error(f"Failed to start summaries: {job_resp.text}")
+                else: st.error("Could not load courses for summaries.")
+            except Exception as e: st.error(f"Error generating summaries: {e}")
+
         st.divider() 
         st.subheader("List of Students")
+        student_list_filter = st.text_input("Filter students by name", key="student_list_filter")
         try:
-            response = requests.get(f"{BACKEND_URL}/students", headers=headers)
-            if response.status_code == 200:
-                students = response.json()
+            students_page, response = lazy_list("students_list", "/students", headers, name=student_list_filter)
+            if students_page is not None:
+                students = students_page["rows"]
                 if not students:
                     st.write("No students found.")
                 else:
@@ -584,6 +782,8 @@ else:
 
                         st.markdown("---") 
 
+                    load_more_button("students_list", "/students", headers)
+
             elif response.status_code == 403:
                 st.error("Access denied. Staff or Admin only.")
             else:
@@ -610,16 +810,42 @@ else:
                         try:
                             response = requests.post(f"{BACKEND_URL}/register", json=new_user_data, headers=headers)
                             if response.status_code == 200:
+                                st.session_state.pop('users_list', None)
                                 st.success(f"User '{create_name}' created successfully!"); st.rerun()
                             else: st.error(f"Creation failed: {response.json().get('detail', 'Unknown error')}")
                         except Exception as e: st.error(f"Error creating user: {e}")
         
+        with st.expander("📥 Bulk Create Users from CSV"):
+            st.write("Upload a CSV with columns name, email, password and (optionally) role. Rows without a role become students.")
+            users_file = st.file_uploader("Users CSV", type=["csv"], key="users_csv")
+            if users_file is not None and st.button("Create Users"):
+                try:
+                    user_rows = pd.read_csv(users_file, dtype=str).fillna("")
+                    new_users = [
+                        {"name": row['name'], "email": row['email'], "password": row['password'], "role": row.get('role') or "student"}
+                        for row in user_rows.to_dict(orient="records")
+                    ]
+                    with st.spinner(f"Creating {len(new_users)} users..."):
+                        response = requests.post(f"{BACKEND_URL}/register/bulk", json=new_users, headers=headers)
+                    if response.status_code == 200:
+                        result = response.json()
+                        st.session_state.pop('users_list', None)
+                        st.success(f"Created {len(result['created'])} users.")
+                        if result['duplicates']:
+                            st.warning("These users were skipped:")
+                            st.dataframe(result['duplicates'], use_container_width=True)
+                    else: st.error(f"Bulk creation failed: {response.text}")
+                except Exception as e: st.error(f"Error creating users: {e}")
+
         st.divider() 
         st.subheader("Current Users")
+        filter_col1, filter_col2 = st.columns(2)
+        user_role_filter = filter_col1.selectbox("Role", ["", "student", "staff", "admin"], format_func=lambda role: role or "All roles", key="user_role_filter")
+        user_name_filter = filter_col2.text_input("Filter users by name", key="user_name_filter")
         try:
-            response = requests.get(f"{BACKEND_URL}/users", headers=headers)
-            if response.status_code == 200:
-                users = response.json()
+            users_page, response = lazy_list("users_list", "/users", headers, role=user_role_filter, name=user_name_filter)
+            if users_page is not None:
+                users = users_page["rows"]
                 display_data = [{"id": u['id'], "name": u['name'], "email": u['email'], "role": u['role']} for u in users]
                 cols = st.columns((1, 2, 2, 1, 1))
                 column_headers = ["ID", "Name", "Email", "Role", "Action"]
@@ -635,8 +861,10 @@ else:
                     if cols[4].button("Delete", key=f"delete_{row_key}"):
                         delete_response = requests.delete(f"{BACKEND_URL}/users/{user_data['id']}", headers=headers)
                         if delete_response.status_code == 200:
+                            st.session_state.pop('users_list', None)
                             st.success(f"User {user_data['name']} deleted successfully."); st.rerun()
                         else: st.error(f"Failed to delete user: {delete_response.text}")
+                load_more_button("users_list", "/users", headers)
             elif response.status_code == 403: st.error("You do not have permission to view users.")
             else: st.error(f"Failed to fetch users: {response.text}")
         except Exception as e: st.error(f"An error occurred: {e}")
@@ -649,10 +877,8 @@ else:
         
         # Load all courses for a dropdown
         try:
-            # We fetch ALL courses, no 'params' needed
-            courses_resp = requests.get(f"{BACKEND_URL}/courses", headers=headers)
-            if courses_resp.status_code == 200:
-                courses_list = courses_resp.json()
+            courses_list = fetch_all_pages("/courses", headers)
+            if courses_list is not None:
                 # Create a {Name: ID} map from all courses
                 course_name_map = {c['name']: c['id'] for c in courses_list} 
                 
@@ -4,7 +4,10 @@ from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import List
+from cachetools import TTLCache
+import threading
 import database
+import tracing
 
 # Load secrets from your .env file
 JWT_SECRET = config('JWT_SECRET')
@@ -13,6 +16,33 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# --- Authenticated User Cache ---
+# Short-lived cache of user rows keyed by token subject (email), so repeat
+# requests from the same user skip the users-table lookup.
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=30, cast=int) # Seconds
+USER_CACHE_MAX_SIZE = config('USER_CACHE_MAX_SIZE', default=1024, cast=int)
+
+_user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+_user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def invalidate_cached_user(email: str = None, user_id: int = None):
+    """Drops a user's cached row, looked up by email and/or id."""
+    with _user_cache_lock:
+        keys = set()
+        if email is not None and email in _user_cache:
+            keys.add(email)
+        if user_id is not None:
+            keys.update(key for key, row in _user_cache.items() if row['id'] == user_id)
+        for key in keys:
+            del _user_cache[key]
+        _user_cache_stats["invalidations"] += len(keys)
+
+def user_cache_stats():
+    """Returns hit/miss counters and current size of the user cache."""
+    with _user_cache_lock:
+        return {**_user_cache_stats, "size": len(_user_cache), "max_size": USER_CACHE_MAX_SIZE, "ttl_seconds": USER_CACHE_TTL}
+
 def create_access_token(data: dict):
     """Creates a new JWT access token."""
     to_encode = data.copy()
@@ -34,6 +64,10 @@ def verify_token(token: str, credentials_exception):
 
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
+    with tracing.span("auth.get_current_user"):
+        return _get_current_user(token)
+
+def _get_current_user(token: str):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -42,6 +76,15 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = verify_token(token, credentials_exception)
     
     email: str = payload.get("sub")
+
+    with _user_cache_lock:
+        cached_user = _user_cache.get(email)
+        if cached_user is not None:
+            _user_cache_stats["hits"] += 1
+            tracing.annotate(cache="hit")
+            return dict(cached_user) # Copy, since callers may add keys
+        _user_cache_stats["misses"] += 1
+    tracing.annotate(cache="miss")
     
     conn = None
     cursor = None
@@ -53,6 +96,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
         if not db_user:
             raise HTTPException(status_code=404, detail="User not found")
+
+        db_user = dict(db_user)
+        with _user_cache_lock:
+            _user_cache[email] = dict(db_user)
         return db_user
 
     except HTTPException:
@@ -0,0 +1,96 @@
+from psycopg2.extras import execute_values
+from typing import List
+from models.schemas import User
+import argparse
+import csv
+import database
+from . import utils, jwt
+
+def provision_users(users: List[User]):
+    """
+    Creates many users at once: skips emails that already exist, hashes the
+    remaining passwords across the hashing process pool (holding no database
+    connection meanwhile) and inserts them with a single multi-row statement.
+    Returns created users and skipped emails.
+    """
+    duplicates = []
+    unique_users = {}
+    for user in users:
+        if user.email in unique_users:
+            duplicates.append({"email": user.email, "reason": "Duplicate email in upload"})
+        else:
+            unique_users[user.email] = user
+
+    # Don't spend bcrypt time on accounts that already exist. The connection
+    # goes back to the pool before hashing, which can take seconds.
+    if unique_users:
+        with database.db_connection() as conn: # Released (and rolled back) on exit
+            cursor = conn.cursor()
+            cursor.execute('SELECT email FROM users WHERE email = ANY(%s)', (list(unique_users),))
+            existing = [row['email'] for row in cursor.fetchall()]
+            cursor.close()
+        for email in existing:
+            del unique_users[email]
+            duplicates.append({"email": email, "reason": "Email already registered"})
+
+    new_users = list(unique_users.values())
+    if not new_users:
+        return {"created": [], "duplicates": duplicates}
+    hashed_passwords = utils.hash_passwords([user.password for user in new_users])
+
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        # ON CONFLICT covers emails registered while we were hashing
+        created = execute_values(
+            cursor,
+            'INSERT INTO users (name, email, password, role, year_of_study) VALUES %s ON CONFLICT (email) DO NOTHING RETURNING id, name, email, role',
+            [(user.name, user.email, hashed, user.role, user.year_of_study) for user, hashed in zip(new_users, hashed_passwords)],
+            page_size=len(new_users), # One statement for the whole batch
+            fetch=True
+        )
+        conn.commit()
+
+        # Anything not returned lost a race with a concurrent registration
+        created_emails = {row['email'] for row in created}
+        for user in new_users:
+            if user.email not in created_emails:
+                duplicates.append({"email": user.email, "reason": "Email already registered"})
+            jwt.invalidate_cached_user(email=user.email)
+
+        return {"created": [dict(row) for row in created], "duplicates": duplicates}
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+def main():
+    """CLI for offline imports: python -m auth.provisioning users.csv"""
+    parser = argparse.ArgumentParser(description="Bulk-create users from a CSV with columns name,email,password,role and optionally year_of_study.")
+    parser.add_argument("csv_file")
+    parser.add_argument("--default-role", default="student", help="Role for rows without one (default: student)")
+    args = parser.parse_args()
+
+    with open(args.csv_file, newline="", encoding="utf-8") as f:
+        users = [
+            User(
+                name=row['name'], email=row['email'], password=row['password'],
+                role=row.get('role') or args.default_role,
+                year_of_study=row.get('year_of_study') or None # Empty cells stay NULL
+            )
+            for row in csv.DictReader(f)
+        ]
+    print(f"Provisioning {len(users)} users...")
+    try:
+        result = provision_users(users)
+    finally:
+        utils.shutdown_hash_pool()
+    print(f"Created {len(result['created'])} users, skipped {len(result['duplicates'])}.")
+    for duplicate in result['duplicates']:
+        print(f"  skipped {duplicate['email']}: {duplicate['reason']}")
+
+if __name__ == '__main__':
+    main()
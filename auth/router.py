@@ -1,14 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from models.schemas import User, UserDisplay
+from typing import List
 import database
-from . import utils, jwt
+import tracing
+from . import utils, jwt, provisioning
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserDisplay)
 def register_user(user: User):
     """Registers a new user in the database."""
+    # Hashed before borrowing a connection, so a registration burst queued on
+    # the hashing pool doesn't pin pooled connections while it waits
+    try:
+        hashed_password = utils.get_password_hash_offloaded(user.password)
+    except utils.HashingBusyError:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again shortly.")
+
     conn = None 
     cursor = None 
     try:
@@ -23,8 +33,6 @@ def register_user(user: User):
                 detail="Email already registered"
             )
 
-        hashed_password = utils.get_password_hash(user.password)
-
         cursor.execute(
             'INSERT INTO users (name, email, password, role, year_of_study) VALUES (%s, %s, %s, %s, %s) RETURNING id',(user.name, user.email, hashed_password, user.role, user.year_of_study))
         new_user_id_row = cursor.fetchone() 
@@ -33,6 +41,7 @@ def register_user(user: User):
         new_user_id = new_user_id_row['id'] 
 
         conn.commit() 
+        jwt.invalidate_cached_user(email=user.email)
         cursor.execute('SELECT id, name, email, role FROM users WHERE id = %s', (new_user_id,))
         new_user = cursor.fetchone()
 
@@ -54,24 +63,82 @@ def register_user(user: User):
         if conn:
             conn.close()
 
-@router.post("/login")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    """Logs in a user and returns an access token."""
+@router.post("/register/bulk")
+def register_users_bulk(
+    users: List[User],
+    admin: dict = Depends(jwt.require_role(required_roles=["admin"]))
+):
+    """Registers many users at once, reporting emails that already exist. (Admin only)"""
+    if not users:
+        raise HTTPException(status_code=400, detail="No users to register.")
+    try:
+        return provisioning.provision_users(users)
+    except utils.HashingBusyError:
+        raise HTTPException(status_code=503, detail="Server is busy, please try again shortly.")
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"Database error during bulk registration: {error}")
+        raise HTTPException(status_code=500, detail="Database error during bulk registration.")
+
+def _get_login_user(email: str):
     conn = None
     cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE email = %s', (form_data.username,))
-        db_user = cursor.fetchone()
+        cursor.execute('SELECT id, email, password, role FROM users WHERE email = %s', (email,))
+        return cursor.fetchone()
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
 
-        if not db_user or not utils.verify_password(form_data.password, db_user['password']):
+def _update_password_hash(user_id: int, old_hash: str, new_hash: str):
+    """Stores a re-hashed password, unless the password was changed meanwhile."""
+    conn = None
+    cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE users SET password = %s WHERE id = %s AND password = %s',
+            (new_hash, user_id, old_hash)
+        )
+        conn.commit()
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        # Not fatal: the old hash still works and we'll try again next login
+        print(f"Database error while re-hashing password: {error}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+@router.post("/login")
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    """Logs in a user and returns an access token."""
+    try:
+        db_user = await run_in_threadpool(_get_login_user, form_data.username)
+
+        password_ok, new_hash = False, None
+        if db_user:
+            # bcrypt runs on the hashing pool so the event loop stays free
+            with tracing.span("auth.verify_password"):
+                password_ok, new_hash = await utils.verify_and_update_async(form_data.password, db_user['password'])
+
+        if not password_ok:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        if new_hash:
+            # Stored hash uses an old bcrypt cost; upgrade it now we know the password
+            await run_in_threadpool(_update_password_hash, db_user['id'], db_user['password'], new_hash)
+
         access_token = jwt.create_access_token(
             data={"sub": db_user['email'], "role": db_user['role']}
         )
@@ -80,11 +147,12 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
 
     except HTTPException:
         raise
+    except utils.HashingBusyError:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"Database error during login: {error}")
         raise HTTPException(status_code=500, detail="Database error during login.")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
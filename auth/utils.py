@@ -1,7 +1,54 @@
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+from decouple import config
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import metrics
+
+# bcrypt cost factor. Hashes made with a different cost are transparently
+# re-hashed at the next successful login (see verify_and_update).
+BCRYPT_ROUNDS = config('BCRYPT_ROUNDS', default=12, cast=int)
 
 # Set up the password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+# Worker processes for hashing (bcrypt is CPU-bound, so threads don't help)
+HASH_WORKERS = config('HASH_WORKERS', default=os.cpu_count() or 1, cast=int)
+# Hash/verify jobs allowed to wait or run at once; beyond this requests are turned away
+HASH_MAX_PENDING = config('HASH_MAX_PENDING', default=(os.cpu_count() or 1) * 16, cast=int)
+# Bulk hashing (hash_passwords) submits passwords in chunks of HASH_BULK_CHUNK_SIZE
+# and keeps at most HASH_BULK_MAX_IN_FLIGHT chunks queued, so logins submitted
+# meanwhile only ever wait behind a few chunks
+HASH_BULK_CHUNK_SIZE = config('HASH_BULK_CHUNK_SIZE', default=4, cast=int)
+HASH_BULK_MAX_IN_FLIGHT = config('HASH_BULK_MAX_IN_FLIGHT', default=max(1, HASH_WORKERS // 2), cast=int)
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "pending": 0, # Queued or running right now
+    "max_pending": 0,
+    "submitted": 0,
+    "rejected": 0,
+    "failed": 0,
+    "bulk_passwords": 0,
+    "total_seconds": 0.0,
+}
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing pool already has HASH_MAX_PENDING jobs."""
+
 
 def verify_password(plain_password, hashed_password):
     """Checks if the plain password matches the hashed one."""
@@ -9,4 +56,118 @@ def verify_password(plain_password, hashed_password):
 
 def get_password_hash(password):
     """Hashes a plain password."""
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def verify_and_update(plain_password, hashed_password):
+    """
+    Returns (is_valid, new_hash). new_hash is set when the stored hash uses an
+    outdated bcrypt cost and should be replaced.
+    """
+    try:
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except ValueError: # Malformed or unknown hash
+        return False, None
+
+def _get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # 'spawn' so workers don't inherit the server's threads and sockets
+            _hash_pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _hash_pool
+
+def _submit(fn, *args, bulk=False):
+    """Submits a job to the hashing pool, refusing it if the queue is full."""
+    with _stats_lock:
+        if _stats["pending"] >= HASH_MAX_PENDING:
+            if not bulk: # Bulk imports wait and retry, so they aren't counted as turned away
+                _stats["rejected"] += 1
+            raise HashingBusyError("Password hashing queue is full.")
+        _stats["pending"] += 1
+        _stats["submitted"] += 1
+        _stats["max_pending"] = max(_stats["max_pending"], _stats["pending"])
+    start = time.perf_counter()
+
+    def _done(future):
+        seconds = time.perf_counter() - start
+        failed = future.cancelled() or future.exception() is not None
+        metrics.PASSWORD_HASH_DURATION.labels(fn.__name__, "error" if failed else "ok").observe(seconds)
+        with _stats_lock:
+            _stats["pending"] -= 1
+            _stats["total_seconds"] += seconds
+            if failed:
+                _stats["failed"] += 1
+
+    try:
+        future = _get_hash_pool().submit(fn, *args)
+    except Exception:
+        with _stats_lock:
+            _stats["pending"] -= 1
+            _stats["failed"] += 1
+        raise
+    future.add_done_callback(_done)
+    return future
+
+def get_password_hash_offloaded(password):
+    """get_password_hash() run on the hashing pool; blocks the calling thread only."""
+    return _submit(get_password_hash, password).result()
+
+async def verify_and_update_async(plain_password, hashed_password):
+    """verify_and_update() run on the hashing pool without blocking the event loop."""
+    return await asyncio.wrap_future(_submit(verify_and_update, plain_password, hashed_password))
+
+def _hash_chunk(passwords):
+    return [get_password_hash(password) for password in passwords]
+
+def hash_passwords(passwords):
+    """
+    Hashes many passwords on the hashing pool, preserving order. Chunks go
+    through _submit like any other job, with at most HASH_BULK_MAX_IN_FLIGHT
+    of them queued at once; when the pool is full the import waits for its
+    own chunks rather than failing.
+    """
+    if len(passwords) < 2:
+        return [get_password_hash(password) for password in passwords]
+    chunks = [passwords[i:i + HASH_BULK_CHUNK_SIZE] for i in range(0, len(passwords), HASH_BULK_CHUNK_SIZE)]
+    in_flight = [] # Futures, oldest first
+    hashed = []
+    try:
+        for chunk in chunks:
+            while True:
+                if len(in_flight) >= HASH_BULK_MAX_IN_FLIGHT:
+                    hashed += in_flight.pop(0).result()
+                try:
+                    in_flight.append(_submit(_hash_chunk, chunk, bulk=True))
+                    break
+                except HashingBusyError:
+                    if not in_flight:
+                        raise
+                    hashed += in_flight.pop(0).result()
+            with _stats_lock:
+                _stats["bulk_passwords"] += len(chunk)
+        for future in in_flight:
+            hashed += future.result()
+    except BaseException:
+        for future in in_flight:
+            future.cancel()
+        raise
+    return hashed
+
+def hashing_stats():
+    """Queue depth and throughput of the hashing pool."""
+    with _stats_lock:
+        completed = _stats["submitted"] - _stats["pending"]
+        return {
+            **_stats,
+            "workers": HASH_WORKERS,
+            "max_queue": HASH_MAX_PENDING,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "avg_seconds": _stats["total_seconds"] / completed if completed else 0.0,
+        }
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False, cancel_futures=True)
+            _hash_pool = None
@@ -0,0 +1,307 @@
+"""
+Load benchmark for the FastAPI backend. Boots main.py's app under uvicorn in
+this process with a fake Gemini (see fake_gemini.py), seeds a dataset on
+first use (see seed_data.py), then drives each scenario with concurrent
+HTTP requests and records throughput and p50/p90/p99 latency as JSON.
+
+    DATABASE_URL=postgresql://localhost/chatbot_bench python benchmarks/api_load.py \\
+        [--requests 500] [--concurrency 16] [--scenarios chat,chat_history] \\
+        [--llm-latency-ms 300] [--compare benchmarks/results/baseline.json]
+
+The queries in main.py are PostgreSQL-only, so the SQLite fallback can't be
+benchmarked. With --compare, scenarios whose p99 grew by more than
+--max-regression are reported and the exit status is 1.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.seed_data import BENCH_PASSWORD, QUESTIONS
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+TOKEN_SAMPLE_SIZE = 500 # Students the scenarios act as
+
+
+# --- Scenarios ---
+# Each takes (client, context, rng) and returns the httpx response.
+async def _login(client, ctx, rng):
+    student = rng.choice(ctx["students"])
+    return await client.post("/login", data={"username": student["email"], "password": BENCH_PASSWORD})
+
+async def _chat(client, ctx, rng):
+    student = rng.choice(ctx["students"])
+    # A unique suffix keeps the response cache out of the way, so every request reaches the model
+    message = f"{rng.choice(QUESTIONS)} ({rng.getrandbits(32):08x})"
+    return await client.post("/chat", json={"message": message}, headers=student["headers"])
+
+async def _chat_history(client, ctx, rng):
+    return await client.get("/chat/history", headers=rng.choice(ctx["students"])["headers"])
+
+async def _course_status(client, ctx, rng):
+    return await client.get(f"/reports/course-status/{rng.choice(ctx['course_ids'])}", headers=ctx["staff_headers"])
+
+async def _grade_distribution(client, ctx, rng):
+    return await client.get("/reports/grade-distribution", params={"bucket_size": 5}, headers=ctx["staff_headers"])
+
+async def _student_summary(client, ctx, rng):
+    student = rng.choice(ctx["students"])
+    return await client.get(f"/reports/student-summary/{student['id']}", headers=ctx["staff_headers"])
+
+async def _usage(client, ctx, rng):
+    return await client.get("/analytics/usage", headers=ctx["admin_headers"])
+
+async def _conversations_per_student(client, ctx, rng):
+    return await client.get("/analytics/conversations-per-student", headers=ctx["admin_headers"])
+
+SCENARIOS = {
+    "login": _login,
+    "chat": _chat,
+    "chat_history": _chat_history,
+    "report_course_status": _course_status,
+    "report_grade_distribution": _grade_distribution,
+    "report_student_summary": _student_summary,
+    "analytics_usage": _usage,
+    "analytics_conversations_per_student": _conversations_per_student,
+}
+
+
+# --- Measurement ---
+def _percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(latencies, statuses: dict, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p90": round(_percentile(latencies, 0.90) * 1000, 2),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+async def run_scenario(client, scenario, ctx, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    import httpx
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        await scenario(client, ctx, rng)
+
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining: # Shared, so the workers split the requests between them
+            start = time.perf_counter()
+            try:
+                status = (await scenario(client, ctx, rng)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+# --- Setup ---
+def prepare_dataset(args) -> dict:
+    """Migrates and seeds the database if needed; returns ids and tokens for the scenarios."""
+    import database
+    import migrate
+    from auth import jwt, utils
+    from benchmarks import seed_data
+
+    migrate.run_migrations()
+    conn = database._connect()
+    try:
+        cursor = conn.cursor()
+        if args.skip_seed:
+            print("Skipping seeding (--skip-seed).")
+        elif seed_data.is_seeded(cursor):
+            print("Benchmark dataset already present; not reseeding.")
+        else:
+            print(f"Seeding {args.students} students, {args.courses} courses, {args.conversations} conversations...")
+            start = time.perf_counter()
+            seed_data.seed(conn, args.students, args.courses, args.conversations,
+                           utils.get_password_hash(seed_data.BENCH_PASSWORD))
+            print(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        cursor.execute(
+            "SELECT id, email FROM users WHERE role = 'student' AND email LIKE %s ORDER BY random() LIMIT %s",
+            (f"%@{seed_data.BENCH_DOMAIN}", TOKEN_SAMPLE_SIZE)
+        )
+        students = [
+            {"id": row['id'], "email": row['email'],
+             "headers": _auth_headers(jwt.create_access_token({"sub": row['email'], "role": "student"}))}
+            for row in cursor.fetchall()
+        ]
+        cursor.execute("SELECT id FROM courses WHERE description LIKE 'Benchmark course %'")
+        course_ids = [row['id'] for row in cursor.fetchall()]
+        dataset = seed_data.dataset_counts(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if not students or not course_ids:
+        raise SystemExit("No benchmark students or courses found; run without --skip-seed first.")
+    return {
+        "students": students,
+        "course_ids": course_ids,
+        "staff_headers": _auth_headers(jwt.create_access_token({"sub": seed_data.STAFF_EMAIL, "role": "staff"})),
+        "admin_headers": _auth_headers(jwt.create_access_token({"sub": seed_data.ADMIN_EMAIL, "role": "admin"})),
+        "dataset": dataset,
+    }
+
+def _auth_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, name="benchmark-server", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 60
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise SystemExit("The app failed to start; see the log above.")
+        time.sleep(0.05)
+    return server, thread
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- Regression comparison ---
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Prints per-scenario changes against a baseline; returns the scenarios whose p99 regressed."""
+    regressed = []
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('started_at')}):")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            print(f"  {name:38} (not in baseline)")
+            continue
+        changes = []
+        for label, now, before in (
+            ("p50", current["latency_ms"]["p50"], previous["latency_ms"]["p50"]),
+            ("p99", current["latency_ms"]["p99"], previous["latency_ms"]["p99"]),
+            ("rps", current["throughput_rps"], previous["throughput_rps"]),
+        ):
+            change = (now - before) / before if before else 0.0
+            changes.append(f"{label} {before:.1f} -> {now:.1f} ({change:+.0%})")
+            if label == "p99" and change > max_regression:
+                regressed.append(name)
+        print(f"  {name:38} " + ", ".join(changes) + ("  REGRESSED" if name in regressed else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API with a fake Gemini.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario first")
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--conversations", type=int, default=1000000)
+    parser.add_argument("--skip-seed", action="store_true", help="Use whatever data the database already has")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Fake Gemini base latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0, help="Uniform extra latency on top of the base")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for request mixes")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/api_load-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p99 growth when comparing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if not os.environ.get("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at a PostgreSQL database (the SQLite fallback can't run main.py's queries)")
+    # The fake model stands in for Gemini, but llm.is_configured() still wants a key
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+    from benchmarks.fake_gemini import FakeGemini
+    import httpx
+    import main as backend
+
+    FakeGemini(args.llm_latency_ms, args.llm_jitter_ms, seed=args.seed).install()
+    ctx = prepare_dataset(args)
+    server, thread = start_server(backend.app, args.port)
+
+    results = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms, "llm_jitter_ms": args.llm_jitter_ms, "seed": args.seed,
+        },
+        "dataset": ctx["dataset"],
+        "scenarios": {},
+    }
+
+    async def run_all():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120) as client:
+            for index, name in enumerate(scenarios):
+                summary = await run_scenario(client, SCENARIOS[name], ctx, args.requests,
+                                             args.concurrency, args.warmup, args.seed + index)
+                results["scenarios"][name] = summary
+                latency = summary["latency_ms"]
+                print(f"{name:38} {summary['throughput_rps']:8.1f} req/s  p50 {latency['p50']:8.1f} ms  "
+                      f"p99 {latency['p99']:8.1f} ms  errors {summary['errors']}")
+
+    try:
+        asyncio.run(run_all())
+    finally:
+        server.should_exit = True
+        thread.join(30)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api_load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressed = compare(results, json.load(f), args.max_regression)
+        if regressed:
+            print(f"p99 regressed by more than {args.max_regression:.0%}: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Stand-in for the google.generativeai module, so API benchmarks measure the
+backend rather than Gemini. Every call answers after a configurable delay
+(latency plus uniform jitter); streamed replies spread that delay over their
+chunks. install() hands it to llm.py in place of the real SDK.
+"""
+import asyncio
+import random
+import time
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StreamedResponse:
+    def __init__(self, gemini, text: str):
+        self._gemini = gemini
+        self._text = text
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        words = self._text.split(" ")
+        size = max(1, len(words) // self._gemini.chunks)
+        pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+        delay = self._gemini.delay() / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield _Response(piece)
+
+
+class _FakeChat:
+    def __init__(self, gemini, history):
+        self._gemini = gemini
+        self.history = list(history or [])
+
+    async def send_message_async(self, message, stream: bool = False, request_options=None):
+        text = self._gemini.reply(message)
+        if stream:
+            return _StreamedResponse(self._gemini, text)
+        await asyncio.sleep(self._gemini.delay())
+        return _Response(text)
+
+
+class _FakeModel:
+    def __init__(self, gemini, model_name: str = None, system_instruction: str = None):
+        self._gemini = gemini
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def start_chat(self, history=None):
+        return _FakeChat(self._gemini, history)
+
+    async def generate_content_async(self, prompt, request_options=None):
+        await asyncio.sleep(self._gemini.delay())
+        return _Response(self._gemini.reply(prompt))
+
+    def generate_content(self, prompt, request_options=None):
+        time.sleep(self._gemini.delay())
+        return _Response(self._gemini.reply(prompt))
+
+
+class FakeGemini:
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 100.0, reply_words: int = 80,
+                 chunks: int = 8, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.reply_words = reply_words
+        self.chunks = chunks
+        self._random = random.Random(seed)
+
+    def GenerativeModel(self, model_name: str = None, system_instruction: str = None):
+        return _FakeModel(self, model_name, system_instruction)
+
+    def delay(self) -> float:
+        return (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+
+    def reply(self, prompt) -> str:
+        opening = f"(benchmark reply to: {str(prompt)[:40]!r})"
+        return " ".join([opening] + ["lorem"] * max(0, self.reply_words - 1))
+
+    def install(self):
+        """Makes llm.load_sdk() return this fake instead of importing the SDK."""
+        import llm
+        with llm._sdk_lock:
+            llm._genai = self
+            llm._retryable_errors = (asyncio.TimeoutError,)
@@ -0,0 +1,85 @@
+"""
+Microbenchmark: chat.language.LanguageDetector against a bare langdetect.detect()
+call per message, which is what the chat endpoints did before.
+
+    python benchmarks/language_detection.py [--rounds 20]
+
+Prints the first-call cost (profile loading), the average time per message
+for each approach, and how often the two agree on messages long enough to
+classify.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A mix resembling chat traffic: short follow-ups, longer questions, Indian
+# scripts and a few European languages. Repeated messages are common in practice.
+SAMPLES = [
+    "ok", "thanks!", "exam date?", "hi", "what about lab?",
+    "When is the admission deadline for the next semester?",
+    "How do I get access to the college gym and what are the hours?",
+    "Can you tell me my internal marks for data structures?",
+    "ಗ್ರಂಥಾಲಯದ ಸಮಯ ಏನು?",
+    "ಪರೀಕ್ಷೆಯ ವೇಳಾಪಟ್ಟಿ ಯಾವಾಗ ಪ್ರಕಟವಾಗುತ್ತದೆ?",
+    "लाइब्रेरी कितने बजे खुलती है?",
+    "நூலகம் எப்போது திறக்கும்?",
+    "¿Cuándo es la fecha límite de admisión?",
+    "Quand est la date limite d'inscription ?",
+    "Wann ist die Bibliothek am Wochenende geöffnet?",
+]
+
+
+def _per_message_us(fn, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare language detection approaches.")
+    parser.add_argument("--rounds", type=int, default=20, help="Passes over the sample messages")
+    args = parser.parse_args()
+
+    from langdetect import LangDetectException, detect
+    from chat.language import LanguageDetector, LANGUAGE_SHORT_MESSAGE_CHARS
+
+    def bare_detect(message):
+        try:
+            return detect(message)
+        except LangDetectException:
+            return "en"
+
+    start = time.perf_counter()
+    bare_detect(SAMPLES[0])
+    first_call_ms = (time.perf_counter() - start) * 1000
+
+    detector = LanguageDetector("langdetect")
+    start = time.perf_counter()
+    detector.warm_up()
+    warm_up_ms = (time.perf_counter() - start) * 1000
+
+    bare_us = _per_message_us(bare_detect, SAMPLES, args.rounds)
+    fresh = LanguageDetector("langdetect")
+    fresh.warm_up()
+    cold_us = _per_message_us(lambda message: fresh.detect(message, user_id=1), SAMPLES, 1)
+    cached_us = _per_message_us(lambda message: detector.detect(message, user_id=1), SAMPLES, args.rounds)
+
+    comparable = [message for message in SAMPLES if len(message) >= LANGUAGE_SHORT_MESSAGE_CHARS or not message.isascii()]
+    agreed = sum(bare_detect(message) == detector.detect(message) for message in comparable)
+
+    print(f"first langdetect call (profile load): {first_call_ms:8.1f} ms")
+    print(f"LanguageDetector.warm_up():           {warm_up_ms:8.1f} ms")
+    print(f"bare langdetect.detect():             {bare_us:8.1f} us/message")
+    print(f"LanguageDetector, empty cache:        {cold_us:8.1f} us/message")
+    print(f"LanguageDetector, warm cache:         {cached_us:8.1f} us/message")
+    print(f"agreement on classifiable messages:   {agreed}/{len(comparable)}")
+    print(f"detection paths taken: {detector.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Seeds a benchmark dataset: students, courses, staff and admin accounts,
+enrollments, internal marks, schedules and chat history. Rows are generated
+server-side with generate_series, so a million conversations take seconds
+rather than a million round trips.
+
+Seeding only happens once per database (bench accounts use @bench.local
+emails, and the bench admin is inserted last to mark a complete dataset).
+Point DATABASE_URL at a throwaway database, and recreate it if a seed was
+interrupted.
+"""
+BENCH_DOMAIN = "bench.local"
+BENCH_PASSWORD = "bench-password"
+STAFF_EMAIL = f"bench-staff@{BENCH_DOMAIN}"
+ADMIN_EMAIL = f"bench-admin@{BENCH_DOMAIN}"
+COURSES_PER_STUDENT = 5
+INSTRUCTORS = 50
+
+QUESTIONS = [
+    "What are the library hours?",
+    "When is the admission deadline?",
+    "How do I get gym access?",
+    "What are my internal marks for this semester?",
+    "When does the data structures lab meet?",
+    "Can you explain the attendance policy?",
+    "Who teaches operating systems this term?",
+    "How many credits do I need to graduate?",
+]
+
+
+def is_seeded(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM users WHERE email = %s", (ADMIN_EMAIL,))
+    return cursor.fetchone() is not None
+
+
+def seed(conn, students: int, courses: int, conversations: int, password_hash: str, batch_size: int = 100000):
+    """Inserts the dataset, committing after each step so large inserts don't pile up in one transaction."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            INSERT INTO users (name, email, password, role, year_of_study)
+            SELECT 'Student ' || g, 'student' || g || '@{BENCH_DOMAIN}', %s, 'student', 1 + g %% 4
+            FROM generate_series(1, %s) g
+        ''', (password_hash, students))
+        conn.commit()
+        print(f"  {students} students")
+
+        cursor.execute(f'''
+            INSERT INTO courses (name, description, instructor)
+            SELECT 'Course ' || g, 'Benchmark course ' || g, 'Instructor ' || (1 + g %% {INSTRUCTORS})
+            FROM generate_series(1, %s) g
+        ''', (courses,))
+        cursor.execute('''
+            INSERT INTO schedules (course_id, day_of_week, start_time, end_time, location)
+            SELECT id, (ARRAY['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])[1 + id % 5],
+                   '09:00', '10:00', 'Room ' || (100 + id % 50)
+            FROM courses WHERE description LIKE 'Benchmark course %'
+        ''')
+        conn.commit()
+        print(f"  {courses} courses")
+
+        # Each student takes COURSES_PER_STUDENT courses spread over the catalogue
+        cursor.execute(f'''
+            WITH s AS (SELECT id, row_number() OVER (ORDER BY id) AS n FROM users WHERE email LIKE 'student%@{BENCH_DOMAIN}'),
+                 c AS (SELECT array_agg(id ORDER BY id) AS ids FROM courses WHERE description LIKE 'Benchmark course %')
+            INSERT INTO enrollments (student_id, course_id)
+            SELECT s.id, c.ids[1 + (s.n * 7 + k * 97) % array_length(c.ids, 1)]
+            FROM s, c, generate_series(0, {COURSES_PER_STUDENT - 1}) k
+            ON CONFLICT (student_id, course_id) DO NOTHING
+        ''')
+        cursor.execute(f'''
+            INSERT INTO internal_marks (student_id, course_id, internal_1, internal_2, internal_3)
+            SELECT e.student_id, e.course_id, (e.id * 7) % 26, (e.id * 11) % 26, (e.id * 13) % 26
+            FROM enrollments e JOIN users u ON u.id = e.student_id
+            WHERE u.email LIKE 'student%@{BENCH_DOMAIN}'
+            ON CONFLICT (student_id, course_id) DO NOTHING
+        ''')
+        conn.commit()
+        print("  enrollments and internal marks")
+
+        # Conversations are spread round-robin over students, oldest first
+        questions = "ARRAY[" + ", ".join("%s" for _ in QUESTIONS) + "]"
+        for first in range(1, conversations + 1, batch_size):
+            last = min(first + batch_size - 1, conversations)
+            cursor.execute(f'''
+                WITH s AS (SELECT array_agg(id ORDER BY id) AS ids FROM users WHERE email LIKE 'student%%@{BENCH_DOMAIN}')
+                INSERT INTO conversations (user_id, message, response, timestamp)
+                SELECT s.ids[1 + g %% array_length(s.ids, 1)],
+                       ({questions})[1 + g %% {len(QUESTIONS)}],
+                       'Benchmark answer ' || g,
+                       LOCALTIMESTAMP - make_interval(secs => %s - g)
+                FROM s, generate_series(%s, %s) g
+            ''', (*QUESTIONS, conversations, first, last))
+            conn.commit()
+            print(f"  {last}/{conversations} conversations")
+
+        # Inserted last: the admin account is what marks the dataset complete
+        cursor.execute(
+            "INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, 'staff'), (%s, %s, %s, 'admin')",
+            ("Bench Staff", STAFF_EMAIL, password_hash, "Bench Admin", ADMIN_EMAIL, password_hash)
+        )
+        cursor.execute("ANALYZE")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def dataset_counts(cursor) -> dict:
+    counts = {}
+    for table in ("users", "courses", "enrollments", "internal_marks", "conversations"):
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {table}")
+        counts[table] = cursor.fetchone()['count']
+    return counts
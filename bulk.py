@@ -0,0 +1,84 @@
+from decouple import config
+from typing import TYPE_CHECKING
+import io
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# --- Bulk Import Helpers ---
+# Shared by the bulk endpoints: parse an uploaded CSV / JSON-lines body into a
+# DataFrame and validate whole columns at once, collecting per-row errors.
+# pandas is imported inside the functions since it is slow to load at startup.
+BULK_MAX_ROWS = config('BULK_MAX_ROWS', default=100000, cast=int)
+
+
+class BulkParseError(ValueError):
+    """The upload as a whole is unusable (bad format, missing column, too many rows)."""
+
+
+def read_rows(body: bytes, content_type: str) -> "pd.DataFrame":
+    """
+    Parses CSV (default) or JSON lines ('application/x-ndjson' / 'application/jsonl').
+    Rows are indexed from 1 so errors can point at data rows.
+    """
+    import pandas as pd
+    try:
+        if "json" in content_type:
+            df = pd.read_json(io.BytesIO(body), lines=True, dtype=False)
+        else:
+            df = pd.read_csv(io.BytesIO(body), dtype=str, skipinitialspace=True, keep_default_na=False)
+    except ValueError as e:
+        raise BulkParseError(f"Could not parse upload: {e}")
+    if len(df) > BULK_MAX_ROWS:
+        raise BulkParseError(f"At most {BULK_MAX_ROWS} rows per upload.")
+    df.columns = [str(column).strip().lower() for column in df.columns]
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    return df
+
+
+def field_bounds(model, field: str):
+    """(ge, le) constraints declared on a Pydantic model field, e.g. conint(ge=0, le=25)."""
+    minimum = maximum = None
+    for constraint in model.model_fields[field].metadata:
+        if getattr(constraint, "ge", None) is not None:
+            minimum = constraint.ge
+        if getattr(constraint, "le", None) is not None:
+            maximum = constraint.le
+    return minimum, maximum
+
+
+def integer_column(df, column: str, errors: dict, minimum=None, maximum=None, default=None) -> "pd.Series":
+    """
+    Vectorized integer check for one column. Bad rows get an entry in errors
+    (row number -> message, first error wins). Blank cells, or a missing
+    column, take the default if there is one.
+    """
+    import pandas as pd
+    if column not in df.columns:
+        if default is None:
+            raise BulkParseError(f"Missing required column '{column}'.")
+        return pd.Series(default, index=df.index, dtype="int64")
+
+    raw = df[column]
+    blank = raw.isna() | (raw.astype(str).str.strip() == "")
+    values = pd.to_numeric(raw.where(~blank), errors="coerce")
+    if default is not None:
+        values = values.where(~blank, default)
+
+    bad = values.isna() | (values % 1 != 0)
+    if minimum is not None:
+        bad |= values < minimum
+    if maximum is not None:
+        bad |= values > maximum
+
+    if minimum is not None and maximum is not None:
+        message = f"{column} must be an integer between {minimum} and {maximum}."
+    else:
+        message = f"{column} must be an integer."
+    for row in df.index[bad]:
+        errors.setdefault(int(row), message)
+    return values.where(~bad, 0).astype("int64")
+
+
+def error_list(errors: dict):
+    return [{"row": row, "error": errors[row]} for row in sorted(errors)]
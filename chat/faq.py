@@ -0,0 +1,124 @@
+from decouple import config
+import math
+import re
+import threading
+import time
+
+# --- FAQ Retrieval Settings ---
+FAQ_TOP_K = config('FAQ_TOP_K', default=3, cast=int) # Max FAQ entries injected into the system prompt
+FAQ_MIN_SCORE = config('FAQ_MIN_SCORE', default=0.5, cast=float) # BM25 score below which a match is ignored
+FAQ_INDEX_REFRESH_SECONDS = config('FAQ_INDEX_REFRESH_SECONDS', default=300, cast=int) # Picks up edits made by other workers
+
+_TOKEN = re.compile(r"\w+")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "at", "be", "can", "do", "does", "for", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which", "who", "you",
+})
+
+# BM25 parameters
+_K1 = 1.5
+_B = 0.75
+
+
+def tokenize(text: str):
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class FaqIndex:
+    """
+    In-memory BM25 inverted index over the faqs table. Built once from the
+    database, then updated entry by entry when FAQs are created, edited or
+    deleted through the API.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {} # faq id -> {"id", "question", "answer", "keywords"}
+        self._postings = {} # term -> {faq id: term frequency}
+        self._doc_lengths = {} # faq id -> number of indexed terms
+        self._total_length = 0
+        self._loaded_at = None
+        self.version = None # 'faq_version' config value the index was built at
+
+    def needs_refresh(self, version=None) -> bool:
+        """True when the index is old, or (given the current 'faq_version') when another worker edited FAQs."""
+        if version is not None and version != self.version:
+            return True
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > FAQ_INDEX_REFRESH_SECONDS
+
+    def refresh(self, cursor, version=None):
+        """Rebuilds the whole index from the faqs table."""
+        cursor.execute('SELECT id, question, answer, keywords FROM faqs')
+        rows = cursor.fetchall()
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._doc_lengths.clear()
+            self._total_length = 0
+            for row in rows:
+                self._add(dict(row))
+            self._loaded_at = time.monotonic()
+            self.version = version
+
+    def upsert(self, faq: dict):
+        with self._lock:
+            self._remove(faq['id'])
+            self._add(faq)
+
+    def remove(self, faq_id: int):
+        with self._lock:
+            self._remove(faq_id)
+
+    def search(self, query: str, k: int = FAQ_TOP_K):
+        """Returns up to k FAQ entries ranked by BM25 score, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._entries)
+            if not terms or not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for faq_id, tf in postings.items():
+                    norm = tf + _K1 * (1 - _B + _B * self._doc_lengths[faq_id] / avg_length)
+                    scores[faq_id] = scores.get(faq_id, 0.0) + idf * tf * (_K1 + 1) / norm
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                {**self._entries[faq_id], "score": score}
+                for faq_id, score in ranked if score >= FAQ_MIN_SCORE
+            ]
+
+    def _add(self, faq: dict):
+        # Question and keywords count twice so they outweigh words in the answer
+        terms = tokenize(faq['question']) * 2 + tokenize(faq.get('keywords') or "") * 2 + tokenize(faq['answer'])
+        self._entries[faq['id']] = faq
+        self._doc_lengths[faq['id']] = len(terms)
+        self._total_length += len(terms)
+        for term in terms:
+            postings = self._postings.setdefault(term, {})
+            postings[faq['id']] = postings.get(faq['id'], 0) + 1
+
+    def _remove(self, faq_id: int):
+        faq = self._entries.pop(faq_id, None)
+        if faq is None:
+            return
+        self._total_length -= self._doc_lengths.pop(faq_id)
+        for term in set(tokenize(faq['question']) + tokenize(faq.get('keywords') or "") + tokenize(faq['answer'])):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(faq_id, None)
+                if not postings:
+                    del self._postings[term]
+
+
+def faq_context(matches) -> str:
+    """System-prompt fragment for the retrieved FAQ entries."""
+    if not matches:
+        return ""
+    return "Relevant Information: " + " ".join(match['answer'] for match in matches)
+
+
+faq_index = FaqIndex()
@@ -0,0 +1,128 @@
+from decouple import config
+import database
+import llm
+from chat import writer
+
+# --- History Window Settings ---
+CHAT_HISTORY_TURNS = config('CHAT_HISTORY_TURNS', default=10, cast=int) # Most recent turns sent verbatim
+CHAT_HISTORY_TOKEN_BUDGET = config('CHAT_HISTORY_TOKEN_BUDGET', default=2000, cast=int) # Approximate tokens for those turns
+CHAT_SUMMARY_BATCH = config('CHAT_SUMMARY_BATCH', default=10, cast=int) # Older turns folded into the summary at once
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def load_history_window(cursor, user_id: int):
+    """
+    Loads the rolling summary and the recent, not-yet-summarized turns for a user.
+
+    Returns (summary, last_summarized_id, window_rows, overflow_rows): window_rows
+    fit in CHAT_HISTORY_TURNS / CHAT_HISTORY_TOKEN_BUDGET (oldest first), and
+    overflow_rows are older unsummarized turns waiting to be folded into the summary.
+    When there are more of those than one batch, overflow_rows is the oldest
+    batch, so the summary catches up in order instead of skipping turns.
+    """
+    cursor.execute(
+        'SELECT summary, last_conversation_id FROM conversation_summaries WHERE user_id = %s',
+        (user_id,)
+    )
+    summary_row = cursor.fetchone()
+    summary = summary_row['summary'] if summary_row else ""
+    last_summarized_id = summary_row['last_conversation_id'] if summary_row else 0
+
+    # Read at most one window plus one summary batch, newest first
+    cursor.execute(
+        'SELECT id, message, response FROM conversations WHERE user_id = %s AND id > %s ORDER BY id DESC LIMIT %s',
+        (user_id, last_summarized_id, CHAT_HISTORY_TURNS + CHAT_SUMMARY_BATCH)
+    )
+    rows = cursor.fetchall()
+    backlog = len(rows) == CHAT_HISTORY_TURNS + CHAT_SUMMARY_BATCH # There may be older unsummarized turns
+
+    window_rows = []
+    tokens_used = 0
+    for row in rows[:CHAT_HISTORY_TURNS]:
+        row_tokens = estimate_tokens(row['message']) + estimate_tokens(row['response'])
+        if window_rows and tokens_used + row_tokens > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        window_rows.append(row)
+        tokens_used += row_tokens
+    overflow_rows = rows[len(window_rows):]
+
+    window_rows.reverse()
+    overflow_rows.reverse()
+    if backlog and len(overflow_rows) >= CHAT_SUMMARY_BATCH:
+        cursor.execute(
+            'SELECT id, message, response FROM conversations WHERE user_id = %s AND id > %s ORDER BY id ASC LIMIT %s',
+            (user_id, last_summarized_id, CHAT_SUMMARY_BATCH)
+        )
+        overflow_rows = cursor.fetchall()
+    return summary, last_summarized_id, window_rows, overflow_rows
+
+
+def build_gemini_history(window_rows):
+    gemini_history = []
+    for row in window_rows:
+        gemini_history.append({"role": "user", "parts": [{"text": row['message']}]})
+        gemini_history.append({"role": "model", "parts": [{"text": row['response']}]})
+    return gemini_history
+
+
+def summary_instruction(summary: str) -> str:
+    """System-prompt fragment carrying the rolling summary, if there is one."""
+    if not summary:
+        return ""
+    return f" Summary of your earlier conversation with this student: {summary}"
+
+
+def needs_summary_update(overflow_rows) -> bool:
+    return len(overflow_rows) >= CHAT_SUMMARY_BATCH
+
+
+def fold_into_summary(user_id: int, summary: str, overflow_rows):
+    """
+    Folds older turns into the user's persisted rolling summary, keeping the
+    per-message history read bounded. Meant to run as a background task.
+    """
+    # Never move last_conversation_id past a turn that is still being written,
+    # or that turn would be skipped by both the window and the summary
+    pending_id = writer.conversation_writer.lowest_pending_id(user_id)
+    if pending_id is not None:
+        overflow_rows = [row for row in overflow_rows if row['id'] < pending_id]
+        if not overflow_rows:
+            return
+    prompt = (
+        "Update the running summary of a conversation between a college student and a chatbot. "
+        "Keep it under 120 words and keep facts the student shared about themselves.\n\n"
+        f"CURRENT SUMMARY:\n{summary or '(none)'}\n\nNEW TURNS:\n"
+    )
+    for row in overflow_rows:
+        prompt += f"- User: \"{row['message']}\" -> Bot: \"{row['response']}\"\n"
+    prompt += "\nUPDATED SUMMARY:"
+
+    conn = None; cursor = None
+    try:
+        new_summary = llm.generate_sync(prompt).strip()
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            '''
+            INSERT INTO conversation_summaries (user_id, summary, last_conversation_id)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (user_id)
+            DO UPDATE SET
+                summary = EXCLUDED.summary,
+                last_conversation_id = EXCLUDED.last_conversation_id,
+                updated_at = CURRENT_TIMESTAMP
+            ''',
+            (user_id, new_summary, overflow_rows[-1]['id'])
+        )
+        conn.commit()
+    except Exception as e:
+        # The chat reply has already been saved; retry the fold on the next message
+        print(f"Error updating conversation summary for user {user_id}: {e}")
+        if conn: conn.rollback()
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
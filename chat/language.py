@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from decouple import config
+import threading
+import time
+import unicodedata
+import metrics
+
+# --- Language Detection Settings ---
+LANGUAGE_DETECTION_BACKEND = config('LANGUAGE_DETECTION_BACKEND', default='langdetect') # See register_backend()
+LANGUAGE_DETECTION_SEED = config('LANGUAGE_DETECTION_SEED', default=0, cast=int) # Makes langdetect deterministic
+LANGUAGE_DEFAULT = config('LANGUAGE_DEFAULT', default='en')
+LANGUAGE_CACHE_SIZE = config('LANGUAGE_CACHE_SIZE', default=4096, cast=int) # Distinct messages remembered
+LANGUAGE_USER_MEMORY_SIZE = config('LANGUAGE_USER_MEMORY_SIZE', default=10000, cast=int) # Users whose last language is remembered
+# ASCII messages shorter than this ("ok", "thanks", "exam date?") are too short to
+# classify reliably, so they reuse the user's last language instead
+LANGUAGE_SHORT_MESSAGE_CHARS = config('LANGUAGE_SHORT_MESSAGE_CHARS', default=24, cast=int)
+
+# Scripts used by exactly one language langdetect knows, keyed by the prefix
+# of the Unicode character name. Shared scripts (Latin, Cyrillic, Arabic,
+# Devanagari, Han) still go to the backend.
+_SCRIPT_LANGUAGES = {
+    "KANNADA": "kn", "TAMIL": "ta", "TELUGU": "te", "MALAYALAM": "ml", "BENGALI": "bn",
+    "GUJARATI": "gu", "GURMUKHI": "pa", "THAI": "th", "HANGUL": "ko", "HIRAGANA": "ja",
+    "KATAKANA": "ja", "GREEK": "el", "HEBREW": "he",
+}
+
+
+# --- Backends ---
+# A backend factory returns a callable text -> language code (or None when it
+# can't tell). Factories run on first use, so heavy libraries load lazily.
+_BACKENDS = {}
+
+def register_backend(name: str):
+    def decorator(factory):
+        _BACKENDS[name] = factory
+        return factory
+    return decorator
+
+@register_backend("langdetect")
+def _langdetect_backend():
+    from langdetect import DetectorFactory, LangDetectException, detect
+    DetectorFactory.seed = LANGUAGE_DETECTION_SEED
+    detect("warm up") # Loads the language profiles now rather than racing on first use
+
+    def detect_language(text):
+        try:
+            return detect(text)
+        except LangDetectException:
+            return None
+    return detect_language
+
+@register_backend("script")
+def _script_only_backend():
+    # Script heuristics alone; everything else falls back to the default language
+    return lambda text: None
+
+
+def _script_language(text: str):
+    """Language implied by the message's script, if its letters are mostly in one unique script."""
+    counts = {}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        if char.isascii():
+            continue
+        script = unicodedata.name(char, "").split(" ", 1)[0]
+        language = _SCRIPT_LANGUAGES.get(script)
+        if language:
+            counts[language] = counts.get(language, 0) + 1
+    if not counts:
+        return None
+    language, count = max(counts.items(), key=lambda item: item[1])
+    return language if count * 2 > letters else None
+
+
+class LanguageDetector:
+    """
+    Detects the language of chat messages, cheapest check first: script
+    heuristics, then the user's last language for short ASCII messages, then
+    an LRU cache of earlier results, and only then the backend.
+    """
+    def __init__(self, backend_name: str):
+        if backend_name not in _BACKENDS:
+            raise ValueError(f"Unknown language detection backend '{backend_name}'.")
+        self.backend_name = backend_name
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict() # normalized message -> language
+        self._user_languages = OrderedDict() # user id -> last detected language
+        self._stats = {"script": 0, "short_message": 0, "cache_hits": 0, "backend": 0, "backend_unknown": 0}
+
+    def warm_up(self):
+        self._get_backend()
+
+    def detect(self, text: str, user_id: int = None) -> str:
+        start = time.perf_counter()
+        language, path = self._detect(text, user_id)
+        metrics.LANGUAGE_DETECTION_DURATION.labels(path).observe(time.perf_counter() - start)
+        with self._lock:
+            self._stats[path] += 1
+        return language
+
+    def _detect(self, text: str, user_id):
+        """Returns (language, name of the path that decided it)."""
+        normalized = " ".join(text.lower().split())
+        language = _script_language(normalized)
+        if language:
+            self._remember_user(user_id, language)
+            return language, "script"
+
+        if len(normalized) < LANGUAGE_SHORT_MESSAGE_CHARS and normalized.isascii():
+            return self._last_language(user_id), "short_message"
+
+        with self._lock:
+            language = self._cache.get(normalized)
+            if language is not None:
+                self._cache.move_to_end(normalized)
+        if language is not None:
+            path = "cache_hits"
+        else:
+            language = self._get_backend()(normalized)
+            if language is None:
+                return self._last_language(user_id), "backend_unknown"
+            path = "backend"
+            with self._lock:
+                self._cache[normalized] = language
+                while len(self._cache) > LANGUAGE_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        self._remember_user(user_id, language)
+        return language, path
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "backend_name": self.backend_name,
+                "cached_messages": len(self._cache),
+                "remembered_users": len(self._user_languages),
+            }
+
+    def _get_backend(self):
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = _BACKENDS[self.backend_name]()
+            return self._backend
+
+    def _last_language(self, user_id):
+        with self._lock:
+            return self._user_languages.get(user_id, LANGUAGE_DEFAULT)
+
+    def _remember_user(self, user_id, language: str):
+        if user_id is None:
+            return
+        with self._lock:
+            self._user_languages[user_id] = language
+            self._user_languages.move_to_end(user_id)
+            while len(self._user_languages) > LANGUAGE_USER_MEMORY_SIZE:
+                self._user_languages.popitem(last=False)
+
+
+language_detector = LanguageDetector(LANGUAGE_DETECTION_BACKEND)
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+from decouple import config
+import hashlib
+import re
+import threading
+import time
+
+# --- Response Cache Settings ---
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_MAX_ENTRIES = config('RESPONSE_CACHE_MAX_ENTRIES', default=1000, cast=int)
+RESPONSE_CACHE_TTL = config('RESPONSE_CACHE_TTL', default=3600, cast=int) # Seconds
+RESPONSE_CACHE_SIMILARITY = config('RESPONSE_CACHE_SIMILARITY', default=0.85, cast=float) # 0 disables fuzzy matching
+RESPONSE_CACHE_MAX_MESSAGE_LENGTH = config('RESPONSE_CACHE_MAX_MESSAGE_LENGTH', default=300, cast=int) # Long messages are rarely repeated
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercases, drops punctuation and collapses whitespace."""
+    message = _NON_WORD.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", message).strip()
+
+
+def prompt_version(system_prompt: str, faq_version: int = 0) -> str:
+    """
+    Short fingerprint of the system prompt and FAQ version, so a prompt or FAQ
+    change never serves stale answers, even on workers that missed the clear().
+    """
+    return f"{hashlib.sha1(system_prompt.encode('utf-8')).hexdigest()[:12]}:{faq_version}"
+
+
+def is_cacheable(summary: str, window_rows) -> bool:
+    """
+    Replies are shared between users, so only replies generated without any
+    per-user context (no history window, no rolling summary) may be stored.
+    Lookups are made for every user.
+    """
+    return not summary and not window_rows
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of chatbot replies keyed on (normalized message, language,
+    prompt version). Shared by all users, so only context-free replies are
+    stored: see is_cacheable(). Exact matches are tried first, then, if a similarity
+    threshold is set, the closest cached message by character-trigram
+    Jaccard similarity within the same language / prompt version.
+    """
+    def __init__(self, max_entries, ttl, similarity_threshold):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._similarity_threshold = similarity_threshold
+        self._entries = OrderedDict() # key -> (response, expires_at, trigrams)
+        self._buckets = {} # (language, prompt_version) -> set of keys, for fuzzy lookups
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, message: str, language: str, version: str):
+        normalized = normalize_message(message)
+        if not normalized or len(normalized) > RESPONSE_CACHE_MAX_MESSAGE_LENGTH:
+            return None
+        key = (normalized, language, version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["exact_hits"] += 1
+                    return entry[0]
+                self._remove(key)
+                self._stats["expirations"] += 1
+
+            if self._similarity_threshold > 0:
+                best_key, best_score = None, self._similarity_threshold
+                grams = _trigrams(normalized)
+                for candidate in list(self._buckets.get((language, version), ())):
+                    response, expires_at, candidate_grams = self._entries[candidate]
+                    if expires_at <= now:
+                        self._remove(candidate)
+                        self._stats["expirations"] += 1
+                        continue
+                    score = len(grams & candidate_grams) / len(grams | candidate_grams)
+                    if score >= best_score:
+                        best_key, best_score = candidate, score
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._stats["similar_hits"] += 1
+                    return self._entries[best_key][0]
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, message: str, language: str, version: str, response: str):
+        normalized = normalize_message(message)
+        if not normalized or len(normalized) > RESPONSE_CACHE_MAX_MESSAGE_LENGTH or not response:
+            return
+        key = (normalized, language, version)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (response, time.monotonic() + self._ttl, _trigrams(normalized))
+            self._buckets.setdefault((language, version), set()).add(key)
+            while len(self._entries) > self._max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["similar_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        del self._entries[key]
+        bucket = self._buckets.get(key[1:])
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[key[1:]]
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_TTL,
+    similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+)
@@ -0,0 +1,188 @@
+from decouple import config
+from psycopg2.extras import execute_values
+import queue
+import threading
+import time
+import database
+
+# --- Conversation Write-Behind ---
+# With CHAT_WRITE_BEHIND on, a chat turn gets its id and timestamp from the
+# database straight away (nextval, no commit to wait for) and is then queued;
+# a background thread inserts queued turns in multi-row batches. A reply can
+# therefore reach the client up to CHAT_WRITE_FLUSH_INTERVAL before its row is
+# visible in /chat/history. Turns still queued are flushed on shutdown.
+#
+# Reserved ids can commit out of order (a sync write while the queue is full,
+# a retried batch), so the writer tracks its reserved-but-unwritten ids and
+# chat.history.fold_into_summary never folds past the lowest one. Ids pending
+# on another worker aren't visible here; a user would have to send a whole
+# history window of further turns within one flush for that to matter.
+CHAT_WRITE_BEHIND = config('CHAT_WRITE_BEHIND', default=False, cast=bool)
+CHAT_WRITE_QUEUE_SIZE = config('CHAT_WRITE_QUEUE_SIZE', default=10000, cast=int) # When full, turns are written synchronously
+CHAT_WRITE_BATCH_SIZE = config('CHAT_WRITE_BATCH_SIZE', default=500, cast=int)
+CHAT_WRITE_FLUSH_INTERVAL = config('CHAT_WRITE_FLUSH_INTERVAL', default=0.2, cast=float) # Seconds
+CHAT_WRITE_MAX_ATTEMPTS = config('CHAT_WRITE_MAX_ATTEMPTS', default=5, cast=int) # Per batch, before it is dropped
+CHAT_WRITE_SHUTDOWN_TIMEOUT = config('CHAT_WRITE_SHUTDOWN_TIMEOUT', default=30.0, cast=float) # Seconds
+
+_RESERVE_QUERY = "SELECT nextval(pg_get_serial_sequence('conversations', 'id')) AS id, LOCALTIMESTAMP AS timestamp"
+# Ids are reserved up front, so a retried batch can't insert a turn twice
+_INSERT_QUERY = 'INSERT INTO conversations (id, user_id, message, response, timestamp) VALUES %s ON CONFLICT (id) DO NOTHING'
+
+
+class ConversationWriter:
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=CHAT_WRITE_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "sync_writes": 0, "retries": 0, "dropped": 0}
+        self._pending = {} # user id -> ids reserved but not yet written
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if database._IS_SQLITE:
+            print("Warning: CHAT_WRITE_BEHIND needs PostgreSQL; saving conversations synchronously.")
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id: int, message: str, response: str) -> dict:
+        """Reserves an id for a chat turn, queues it for writing and returns the row."""
+        conn = None; cursor = None
+        try:
+            conn = database.get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(_RESERVE_QUERY)
+            reserved = cursor.fetchone()
+            conn.commit()
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+        row = {"id": reserved['id'], "user_id": user_id, "message": message,
+               "response": response, "timestamp": reserved['timestamp']}
+        with self._lock:
+            self._pending.setdefault(user_id, set()).add(row['id'])
+        try:
+            self._queue.put_nowait(row)
+            self._count("queued")
+        except queue.Full:
+            # Back-pressure: write this one ourselves rather than drop it
+            try:
+                self._insert([row])
+            except Exception:
+                self._forget([row])
+                raise
+            self._count("sync_writes")
+        return row
+
+    def lowest_pending_id(self, user_id: int):
+        """Lowest conversation id reserved for this user but not written yet, or None."""
+        with self._lock:
+            ids = self._pending.get(user_id)
+            return min(ids) if ids else None
+
+    def stop(self):
+        """Stops the writer after flushing everything still queued."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(CHAT_WRITE_SHUTDOWN_TIMEOUT)
+        if self._thread.is_alive():
+            print(f"Conversation writer did not finish within {CHAT_WRITE_SHUTDOWN_TIMEOUT}s; "
+                  f"{self._queue.qsize()} queued conversations may be lost.")
+        self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "enabled": self.running, "pending": self._queue.qsize()}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _forget(self, rows):
+        with self._lock:
+            for row in rows:
+                ids = self._pending.get(row['user_id'])
+                if ids is not None:
+                    ids.discard(row['id'])
+                    if not ids:
+                        del self._pending[row['user_id']]
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=CHAT_WRITE_FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            # Whatever piled up while the previous batch was being written goes in this one
+            while len(batch) < CHAT_WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        for attempt in range(1, CHAT_WRITE_MAX_ATTEMPTS + 1):
+            try:
+                self._insert(batch)
+                self._count("batches")
+                return
+            except (database.psycopg2.IntegrityError, database.psycopg2.DataError) as error:
+                # Retrying can't fix a bad row (e.g. its user was deleted after
+                # submit()), so isolate it instead of failing everyone's turns
+                print(f"DB Error writing {len(batch)} conversations, writing them one by one: {error}")
+                batch = self._write_rows(batch)
+                if not batch:
+                    return
+            except (Exception, database.psycopg2.DatabaseError) as error:
+                print(f"DB Error writing {len(batch)} conversations (attempt {attempt}): {error}")
+            if attempt < CHAT_WRITE_MAX_ATTEMPTS:
+                self._count("retries")
+                time.sleep(min(0.5 * 2 ** attempt, 10.0))
+        print(f"Dropping {len(batch)} conversations after {CHAT_WRITE_MAX_ATTEMPTS} failed attempts.")
+        self._count("dropped", len(batch))
+        self._forget(batch)
+
+    def _write_rows(self, rows):
+        """Inserts rows one at a time, dropping those the database rejects. Returns rows that hit other errors."""
+        remaining = []
+        for row in rows:
+            try:
+                self._insert([row])
+            except (database.psycopg2.IntegrityError, database.psycopg2.DataError) as error:
+                print(f"Dropping conversation {row['id']} of user {row['user_id']}: {error}")
+                self._count("dropped")
+                self._forget([row])
+            except (Exception, database.psycopg2.DatabaseError):
+                remaining.append(row)
+        return remaining
+
+    def _insert(self, rows):
+        conn = None; cursor = None
+        try:
+            conn = database.get_db_connection()
+            cursor = conn.cursor()
+            execute_values(
+                cursor, _INSERT_QUERY,
+                [(row['id'], row['user_id'], row['message'], row['response'], row['timestamp']) for row in rows],
+                page_size=len(rows) # One statement per batch
+            )
+            conn.commit()
+            self._count("written", len(rows))
+            self._forget(rows)
+        except Exception:
+            if conn: conn.rollback()
+            raise
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+
+conversation_writer = ConversationWriter()
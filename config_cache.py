@@ -0,0 +1,120 @@
+from decouple import config
+import select
+import threading
+import time
+import database
+
+# --- System Config Cache ---
+# Rows of system_config are cached per process together with their version.
+# update_system_prompt bumps the version and sends a NOTIFY; workers listening
+# drop their copy straight away, and every worker also re-checks the version
+# at most once per CONFIG_VERSION_CHECK_SECONDS as a fallback.
+CONFIG_VERSION_CHECK_SECONDS = config('CONFIG_VERSION_CHECK_SECONDS', default=5.0, cast=float)
+CONFIG_NOTIFY_CHANNEL = "system_config_changed"
+
+DEFAULT_CONFIG = {
+    "system_prompt": "You are a helpful college chatbot.",
+}
+
+
+class ConfigCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {} # key -> {"value", "version", "checked_at"}
+
+    def get(self, cursor, key: str):
+        """Returns (value, version) for a config key, hitting the DB only when stale."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["checked_at"] < CONFIG_VERSION_CHECK_SECONDS:
+                return entry["value"], entry["version"]
+
+        if entry is None:
+            cursor.execute('SELECT value, version FROM system_config WHERE key = %s', (key,))
+        else:
+            # Cheap version check: only returns a row when something changed
+            cursor.execute(
+                'SELECT value, version FROM system_config WHERE key = %s AND version <> %s',
+                (key, entry["version"])
+            )
+        row = cursor.fetchone()
+
+        with self._lock:
+            if row:
+                entry = {"value": row['value'], "version": row['version']}
+            elif entry is None:
+                entry = {"value": DEFAULT_CONFIG.get(key), "version": 0}
+            entry["checked_at"] = now
+            self._entries[key] = entry
+            return entry["value"], entry["version"]
+
+    def invalidate(self, key: str = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+config_cache = ConfigCache()
+
+
+def notify_config_changed(cursor, key: str):
+    """Tells other workers (via LISTEN/NOTIFY) that a config key changed."""
+    if not database._IS_SQLITE:
+        cursor.execute('SELECT pg_notify(%s, %s)', (CONFIG_NOTIFY_CHANNEL, key))
+
+
+def bump_version(cursor, key: str):
+    """
+    Increments a config row's version (creating the row if needed) and notifies
+    other workers. Used for keys that only act as change counters, such as
+    'grades_version'. Runs inside the caller's transaction.
+    """
+    cursor.execute(
+        '''
+        INSERT INTO system_config (key, value) VALUES (%s, '')
+        ON CONFLICT (key) DO UPDATE SET version = system_config.version + 1
+        ''',
+        (key,)
+    )
+    notify_config_changed(cursor, key)
+    config_cache.invalidate(key)
+
+
+def _listen_forever(stop_event):
+    while not stop_event.is_set():
+        conn = None
+        try:
+            conn = database.psycopg2.connect(database.DATABASE_URL)
+            conn.set_isolation_level(database.psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN {CONFIG_NOTIFY_CHANNEL}')
+            while not stop_event.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notification = conn.notifies.pop(0)
+                    config_cache.invalidate(notification.payload or None)
+        except Exception as e:
+            print(f"Config listener error, retrying: {e}")
+            # Whatever we missed while disconnected is unknown, so start clean
+            config_cache.invalidate()
+            stop_event.wait(5.0)
+        finally:
+            if conn: conn.close()
+
+
+_listener_stop = threading.Event()
+
+def start_config_listener():
+    """Starts the background LISTEN thread (PostgreSQL only)."""
+    if database._IS_SQLITE:
+        return
+    _listener_stop.clear()
+    threading.Thread(target=_listen_forever, args=(_listener_stop,), name="config-listener", daemon=True).start()
+
+def stop_config_listener():
+    _listener_stop.set()
@@ -2,24 +2,36 @@ import psycopg2
 from psycopg2 import sql
 from psycopg2.extras import RealDictCursor # To get dict-like rows
 from decouple import config
+from contextlib import contextmanager
 import sys # For error handling
+import threading
+import time
+import metrics
+import query_log
+import tracing
 
 DATABASE_URL = config('DATABASE_URL', default=None)
 
+# --- Connection Pool Settings ---
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=30.0, cast=float) # Seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_AFTER = config('DB_POOL_HEALTH_CHECK_AFTER', default=60.0, cast=float) # Idle seconds before re-checking a connection
+
 if DATABASE_URL is None and 'pytest' not in sys.modules: 
      print("ERROR: DATABASE_URL environment variable not set.")
      print("WARNING: DATABASE_URL not set. Falling back to local SQLite 'chatbot.db' for development.")
      import sqlite3
      DATABASE_NAME = "chatbot.db"
-     def get_db_connection():
-         conn = sqlite3.connect(DATABASE_NAME)
+     def _connect():
+         # Pooled connections are handed between worker threads
+         conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False)
          conn.row_factory = sqlite3.Row # Keep SQLite row factory for local fallback
          return conn
      _IS_SQLITE = True # Flag to know if we're using SQLite
 
 else:
     _IS_SQLITE = False # We are using PostgreSQL
-    def get_db_connection():
+    def _connect():
         """Establishes a connection to the PostgreSQL database."""
         try:
             conn = psycopg2.connect(DATABASE_URL)
@@ -29,105 +41,245 @@ else:
             print(f"Error connecting to PostgreSQL database: {e}")
             raise
 
-# --- Table Creation ---
-def create_tables():
-    """Creates the necessary tables if they don't already exist."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    print("Ensuring database tables exist...")
 
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT."""
+
+
+def _is_alive(conn):
+    """Runs a trivial query to make sure an idle connection is still usable."""
     try:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                name TEXT NOT NULL,
-                email TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL
-            )
-        ''')
-
-        # Courses Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS courses (
-                id SERIAL PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT NOT NULL,
-                instructor TEXT NOT NULL
-            )
-        ''')
-
-        # Conversations Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                message TEXT NOT NULL,
-                response TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Internal_marks table 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS internal_marks (
-                id SERIAL PRIMARY KEY,
-                student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
-                internal_1 INTEGER DEFAULT 0 CHECK (internal_1 >= 0 AND internal_1 <= 25),
-                internal_2 INTEGER DEFAULT 0 CHECK (internal_2 >= 0 AND internal_2 <= 25),
-                internal_3 INTEGER DEFAULT 0 CHECK (internal_3 >= 0 AND internal_3 <= 25),
-                UNIQUE(student_id, course_id) -- A student has only one set of marks per course
-            )
-        ''')
-
-        # Schedules Table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedules (
-                id SERIAL PRIMARY KEY,
-                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
-                day_of_week TEXT NOT NULL,
-                start_time TEXT NOT NULL,
-                end_time TEXT NOT NULL,
-                location TEXT
-            )
-        ''')
-        
-        # --- NEW Enrollments Table ---
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS enrollments (
-                id SERIAL PRIMARY KEY,
-                student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-                course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
-                UNIQUE(student_id, course_id) -- Prevent duplicate enrollments
-            )
-        ''')
-
-        # System_config table 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS system_config (
-                id SERIAL PRIMARY KEY,
-                key TEXT NOT NULL UNIQUE,
-                value TEXT NOT NULL
-            )
-        ''')
-
-        cursor.execute('''
-            INSERT INTO system_config (key, value)
-            VALUES ('system_prompt', 'You are a helpful college chatbot.')
-            ON CONFLICT (key) DO NOTHING
-        ''')
-
-        conn.commit()
-        print("Database tables checked/created successfully.")
+        if getattr(conn, 'closed', False):
+            return False
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
 
-    except (Exception, psycopg2.DatabaseError) as error:
-        print(f"Error creating tables: {error}")
-        conn.rollback() # Roll back changes if error occurs
+
+class TimedCursor:
+    """Cursor proxy that records how long each statement takes (see metrics.py and query_log.py)."""
+    def __init__(self, raw_cursor):
+        self._raw_cursor = raw_cursor
+
+    def __getattr__(self, name):
+        return getattr(self._raw_cursor, name)
+
+    def __iter__(self):
+        return iter(self._raw_cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._raw_cursor.close()
+
+    def execute(self, query, params=None):
+        return self._timed(self._raw_cursor.execute, query, params)
+
+    def executemany(self, query, params_seq):
+        return self._timed(self._raw_cursor.executemany, query, params_seq, many=True)
+
+    def _timed(self, method, query, params, many=False):
+        operation = metrics.statement_operation(query)
+        failed = False
+        start = time.perf_counter()
+        try:
+            with tracing.span("db.query", operation=operation):
+                return method(query, params)
+        except Exception:
+            failed = True
+            metrics.DB_QUERY_ERRORS.labels(operation).inc()
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.DB_QUERY_DURATION.labels(operation).observe(seconds)
+            query_log.record(self._raw_cursor, query, params, seconds, failed, many)
+
+
+class PooledConnection:
+    """
+    Thin proxy around a raw connection. Everything is forwarded to the
+    real connection except close(), which hands it back to the pool.
+    """
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._raw_conn = raw_conn
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw_conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._raw_conn.cursor(*args, **kwargs))
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw_conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """A bounded, thread-safe pool of database connections."""
+    def __init__(self, connect, max_size, timeout, health_check_after):
+        self._connect = connect
+        self._max_size = max_size
+        self._timeout = timeout
+        self._health_check_after = health_check_after
+        self._idle = [] # (connection, last_used) pairs, most recently used last
+        self._size = 0 # Connections currently open (idle + in use)
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self._timeout
+        with self._lock:
+            while True:
+                if self._idle:
+                    raw_conn, last_used = self._idle.pop()
+                    break
+                if self._size < self._max_size:
+                    raw_conn, last_used = None, None
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(f"No database connection available after {self._timeout}s")
+                self._lock.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._stats["acquired"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+        # Connect / health-check outside the lock so other threads aren't blocked on I/O
+        try:
+            if raw_conn is not None and time.monotonic() - last_used > self._health_check_after:
+                if not _is_alive(raw_conn):
+                    self._close_quietly(raw_conn)
+                    with self._lock:
+                        self._stats["discarded"] += 1
+                    raw_conn = None
+            if raw_conn is None:
+                raw_conn = self._connect()
+                with self._lock:
+                    self._stats["created"] += 1
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        return PooledConnection(self, raw_conn)
+
+    def release(self, raw_conn):
+        # Never hand out a connection with a half-finished transaction
+        healthy = not getattr(raw_conn, 'closed', False)
+        if healthy:
+            try:
+                raw_conn.rollback()
+            except Exception:
+                healthy = False
+        if not healthy:
+            self._close_quietly(raw_conn)
+        with self._lock:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append((raw_conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._stats["discarded"] += 1
+            self._lock.notify()
+
+    def close_all(self):
+        """Closes every idle connection (used on shutdown)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for raw_conn, _ in idle:
+            self._close_quietly(raw_conn)
+
+    def stats(self):
+        with self._lock:
+            acquired = self._stats["acquired"]
+            return {
+                "max_size": self._max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                **self._stats,
+                "avg_wait_seconds": self._stats["total_wait_seconds"] / acquired if acquired else 0.0,
+            }
+
+    @staticmethod
+    def _close_quietly(raw_conn):
+        try:
+            raw_conn.close()
+        except Exception:
+            pass
+
+
+_pool = ConnectionPool(
+    _connect,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+)
+
+def get_db_connection():
+    """
+    Borrows a connection from the pool. Calling close() on it returns it
+    to the pool instead of closing the underlying connection.
+    """
+    with tracing.span("db.pool_acquire"):
+        return _pool.acquire()
+
+@contextmanager
+def db_connection():
+    """Context-manager form of get_db_connection()."""
+    conn = get_db_connection()
+    try:
+        yield conn
     finally:
-        cursor.close()
         conn.close()
 
+def pool_stats():
+    """Returns size and wait-time statistics for the connection pool."""
+    return _pool.stats()
+
+def close_pool():
+    _pool.close_all()
+
+# --- Table Creation ---
+def create_tables():
+    """Brings the schema up to date by applying pending migrations (see migrate.py)."""
+    import migrate # Imported here: migrate depends on this module
+    print("Ensuring database schema is up to date...")
+    try:
+        migrate.run_migrations()
+        print("Database schema checked/migrated successfully.")
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(f"Error migrating database: {error}")
+
 if __name__ == '__main__':
     
      if DATABASE_URL:
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from decouple import config
+from tenacity import AsyncRetrying, Retrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+import asyncio
+import hashlib
+import threading
+import time
+import metrics
+
+# --- Gemini Client Settings ---
+GOOGLE_API_KEY = config('GOOGLE_API_KEY', default=None)
+GEMINI_MODEL_NAME = config('GEMINI_MODEL_NAME', default='gemini-2.5-flash-preview-09-2025')
+LLM_TIMEOUT = config('LLM_TIMEOUT', default=60.0, cast=float) # Seconds per Gemini call
+LLM_MAX_ATTEMPTS = config('LLM_MAX_ATTEMPTS', default=3, cast=int)
+LLM_MODEL_REGISTRY_SIZE = config('LLM_MODEL_REGISTRY_SIZE', default=16, cast=int)
+# Cap on in-flight Gemini calls per worker, so a burst of chats can't exhaust the quota
+LLM_MAX_CONCURRENCY = config('LLM_MAX_CONCURRENCY', default=100, cast=int)
+
+if not GOOGLE_API_KEY:
+    print("Warning: GOOGLE_API_KEY not found. Chatbot AI will not function.")
+
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_REQUEST_OPTIONS = {"timeout": LLM_TIMEOUT}
+
+# The Gemini SDK takes a noticeable share of boot time to import, so it is
+# loaded on first use (or by a warm-up thread after startup)
+_genai = None
+_retryable_errors = None
+_sdk_lock = threading.Lock()
+
+def load_sdk():
+    """Imports and configures the Gemini SDK once; returns the genai module."""
+    global _genai, _retryable_errors
+    with _sdk_lock:
+        if _genai is None:
+            from google.api_core import exceptions as google_exceptions
+            import google.generativeai as genai
+            if GOOGLE_API_KEY:
+                # One process-wide client/transport shared by every model object
+                genai.configure(api_key=GOOGLE_API_KEY)
+            # Errors worth retrying: rate limits, overload and transient server faults
+            _retryable_errors = (
+                google_exceptions.ResourceExhausted,
+                google_exceptions.ServiceUnavailable,
+                google_exceptions.DeadlineExceeded,
+                google_exceptions.InternalServerError,
+            )
+            _genai = genai
+        return _genai
+
+
+def is_configured() -> bool:
+    return bool(GOOGLE_API_KEY)
+
+
+# --- Model Registry ---
+_models = OrderedDict() # (model name, instruction hash) -> GenerativeModel
+_models_lock = threading.Lock()
+
+def get_model(system_instruction: str = None, model_name: str = GEMINI_MODEL_NAME):
+    """Returns a shared GenerativeModel for this model name and system instruction."""
+    instruction_hash = hashlib.sha256((system_instruction or "").encode("utf-8")).hexdigest()
+    key = (model_name, instruction_hash)
+    with _models_lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+        model = load_sdk().GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+        _models[key] = model
+        while len(_models) > LLM_MODEL_REGISTRY_SIZE:
+            _models.popitem(last=False)
+        return model
+
+
+# --- Call Metrics ---
+_metrics_lock = threading.Lock()
+_metrics = {} # operation -> {"calls", "errors", "total_seconds", "max_seconds"}
+
+def _record(operation: str, seconds: float, error: bool = False):
+    metrics.LLM_REQUEST_DURATION.labels(operation, "error" if error else "ok").observe(seconds)
+    with _metrics_lock:
+        stats = _metrics.setdefault(operation, {"calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+def llm_stats():
+    """Per-operation call counts, errors and latency for Gemini calls."""
+    with _metrics_lock:
+        return {
+            operation: {**stats, "avg_seconds": stats["total_seconds"] / stats["calls"] if stats["calls"] else 0.0}
+            for operation, stats in _metrics.items()
+        }
+
+
+def _retry_policy(retrying_class):
+    load_sdk()
+    return retrying_class(
+        retry=retry_if_exception_type(_retryable_errors),
+        stop=stop_after_attempt(LLM_MAX_ATTEMPTS),
+        wait=wait_exponential(multiplier=0.5, max=8),
+        reraise=True,
+    )
+
+
+# --- Calls ---
+async def generate(prompt: str, system_instruction: str = None) -> str:
+    """One-shot generation, with retries."""
+    model = get_model(system_instruction)
+    start = time.perf_counter()
+    try:
+        async with llm_semaphore:
+            async for attempt in _retry_policy(AsyncRetrying):
+                with attempt:
+                    response = await model.generate_content_async(prompt, request_options=_REQUEST_OPTIONS)
+        text = response.text
+    except Exception:
+        _record("generate", time.perf_counter() - start, error=True)
+        raise
+    _record("generate", time.perf_counter() - start)
+    return text
+
+def generate_sync(prompt: str, system_instruction: str = None) -> str:
+    """Blocking form of generate(), for background tasks running on the threadpool."""
+    model = get_model(system_instruction)
+    start = time.perf_counter()
+    try:
+        for attempt in _retry_policy(Retrying):
+            with attempt:
+                response = model.generate_content(prompt, request_options=_REQUEST_OPTIONS)
+        text = response.text
+    except Exception:
+        _record("generate_sync", time.perf_counter() - start, error=True)
+        raise
+    _record("generate_sync", time.perf_counter() - start)
+    return text
+
+async def send_chat_message(chat, message: str) -> str:
+    """Sends one message on a chat session and returns the full reply."""
+    start = time.perf_counter()
+    try:
+        async with llm_semaphore:
+            async for attempt in _retry_policy(AsyncRetrying):
+                with attempt:
+                    response = await chat.send_message_async(message, request_options=_REQUEST_OPTIONS)
+        text = response.text
+    except Exception:
+        _record("chat", time.perf_counter() - start, error=True)
+        raise
+    _record("chat", time.perf_counter() - start)
+    return text
+
+async def stream_chat_message(chat, message: str):
+    """
+    Sends one message on a chat session and yields reply text as it arrives.
+    Only opening the stream is retried; a stream that fails midway raises.
+    """
+    start = time.perf_counter()
+    first_chunk = True
+    try:
+        async with llm_semaphore:
+            async for attempt in _retry_policy(AsyncRetrying):
+                with attempt:
+                    response = await chat.send_message_async(message, stream=True, request_options=_REQUEST_OPTIONS)
+            async for chunk in response:
+                if not chunk.text:
+                    continue
+                if first_chunk:
+                    _record("chat_stream_first_chunk", time.perf_counter() - start)
+                    first_chunk = False
+                yield chunk.text
+    except Exception:
+        _record("chat_stream", time.perf_counter() - start, error=True)
+        raise
+    _record("chat_stream", time.perf_counter() - start)
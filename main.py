@@ -1,47 +1,116 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+_import_started = time.perf_counter() # For the startup timing log
+
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from auth.router import router as auth_router
-from decouple import config
+from auth import utils as auth_utils
 import database 
 from models.schemas import ( 
     Course, UserDisplay, ChatQuery, Chat, CourseCreate, Schedule,
-    ScheduleCreate, EnrollmentCreate, PromptUpdate, InternalMarkCreate, InternalMarkDisplay
+    ScheduleCreate, EnrollmentCreate, PromptUpdate, InternalMarkCreate, InternalMarkDisplay,
+    Faq, FaqCreate, SummaryBatchRequest, BulkEnrollmentCreate
 )
-from auth.jwt import require_role, get_current_user 
-from typing import List
-from langdetect import detect, LangDetectException
-from collections import Counter
+from auth.jwt import require_role, get_current_user, invalidate_cached_user, user_cache_stats
+from typing import List, Optional
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from contextlib import contextmanager
 import urllib.parse
+import json
+import hmac
+import io
+import threading
 from database import create_tables
-
-# Google Gemini API Setup
-import google.generativeai as genai
-GOOGLE_API_KEY = config('GOOGLE_API_KEY', default=None)
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-else:
-    print("Warning: GOOGLE_API_KEY not found. Chatbot AI will not function.")
-# End Gemini Setup 
-
-
-# --- Simulated FAQ Database ---
-FAQ_DATA = {
-    "library hours": "The main library is open from 8 AM to 10 PM on weekdays and 10 AM to 6 PM on weekends.",
-    "admission deadline": "The admission deadline for the next semester is November 15th. You can find more details on the admissions website.",
-    "gym access": "The college gym is available to all students. You need your student ID card for access. Hours are 6 AM to 9 PM daily."
-}
-# --- End FAQ Database ---
+from chat import history as chat_history
+from chat import response_cache
+from chat import faq
+from chat import language
+from chat import writer as chat_writer
+import config_cache
+import llm # Google Gemini API Setup
+import student_summary
+import bulk
+import pagination
+import migrate
+import metrics
+import query_log
+import tracing
+
+_import_seconds = time.perf_counter() - _import_started
 
 app = FastAPI()
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware) # Outermost, so its root span covers the whole request
+
+# Components that keep their own counters are read when /metrics is scraped
+metrics.register_collector("app_db_pool", database.pool_stats, counters=("acquired", "created", "discarded", "timeouts"))
+metrics.register_collector("app_user_cache", user_cache_stats, counters=("hits", "misses", "invalidations"))
+metrics.register_collector(
+    "app_response_cache", response_cache.response_cache.stats,
+    counters=("exact_hits", "similar_hits", "misses", "evictions", "expirations")
+)
+metrics.register_collector(
+    "app_language_detection", language.language_detector.stats,
+    counters=("script", "short_message", "cache_hits", "backend", "backend_unknown")
+)
+metrics.register_collector("app_password_hashing", auth_utils.hashing_stats, counters=("submitted", "rejected", "failed"))
+metrics.register_collector(
+    "app_chat_writer", chat_writer.conversation_writer.stats,
+    counters=("queued", "written", "batches", "sync_writes", "retries", "dropped")
+)
+metrics.register_collector("app_trace_export", tracing.exporter.stats, counters=("exported", "dropped", "failed"))
+metrics.register_collector(
+    "app_query_log", query_log.stats, counters=("slow_queries", "explained", "explain_failed", "explain_dropped")
+)
 
 # --- Database Initialization on Startup ---
+@contextmanager
+def _timed(timings: dict, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+def _warm_up():
+    """Loads the Gemini SDK and the language-detection backend off the request path."""
+    try:
+        llm.load_sdk()
+        language.language_detector.warm_up()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
+
 @app.on_event("startup")
 def on_startup():
     print("Running startup tasks...")
+    timings = {"imports": _import_seconds}
     try:
-         create_tables() # Call the function from database.py
-         print("Startup tasks complete.")
+        # Only run DDL when a migration is actually pending
+        with _timed(timings, "schema_check"):
+            schema_current = migrate.is_up_to_date()
+        if not schema_current:
+            with _timed(timings, "migrations"):
+                create_tables() # Call the function from database.py
+        print("Startup tasks complete.")
     except Exception as e:
          print(f"Error during startup task create_tables: {e}")
+    with _timed(timings, "config_listener"):
+        config_cache.start_config_listener()
+    if chat_writer.CHAT_WRITE_BEHIND:
+        chat_writer.conversation_writer.start()
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    total = sum(timings.values())
+    print("Startup timings: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()) + f", total {total * 1000:.0f}ms")
+
+@app.on_event("shutdown")
+def on_shutdown():
+    auth_utils.shutdown_hash_pool()
+    config_cache.stop_config_listener()
+    chat_writer.conversation_writer.stop() # Flushes queued conversations; needs the pool
+    database.close_pool()
+    query_log.explainer.stop()
+    tracing.exporter.flush()
 
 # Include Authentication Router
 app.include_router(auth_router, tags=["Authentication"])
@@ -51,6 +120,16 @@ app.include_router(auth_router, tags=["Authentication"])
 def read_root():
     return {"Hello": "Backend"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """Prometheus text exposition of request, DB, LLM, hashing and cache metrics."""
+    if not metrics.METRICS_ENABLED or not metrics.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("Authorization", "").encode()
+    if not hmac.compare_digest(supplied, f"Bearer {metrics.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token.")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 any_logged_in_user = Depends(get_current_user)
 require_staff_or_admin = Depends(require_role(required_roles=["staff", "admin"]))
 require_admin_only = Depends(require_role(required_roles=["admin"]))
@@ -73,6 +152,7 @@ def create_course(
             'INSERT INTO courses (name, description, instructor) VALUES (%s, %s, %s)',
             (course.name, course.description, course.instructor)
         )
+        config_cache.bump_version(cursor, 'grades_version')
         conn.commit()
         return {"message": "Course created successfully", "course": course.model_dump()}
     except (Exception, database.psycopg2.DatabaseError) as error:
@@ -84,14 +164,31 @@ def create_course(
         if conn: conn.close()
 
 @app.get("/courses", response_model=List[Course], tags=["Courses"])
-def get_all_courses(user: dict = any_logged_in_user):
+def get_all_courses(
+    response: Response,
+    cursor_id: Optional[int] = Query(None, alias="cursor", description="Id from the previous page's X-Next-Cursor header"),
+    limit: int = Depends(pagination.page_size),
+    name: Optional[str] = Query(None, description="Course name prefix"),
+    instructor: Optional[str] = None,
+    user: dict = any_logged_in_user
+):
+    """Lists courses by id, one page at a time."""
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT id, name, description, instructor FROM courses')
-        courses = cursor.fetchall() 
-        return courses
+        cursor.execute(
+            '''
+            SELECT id, name, description, instructor FROM courses
+            WHERE (%(cursor)s IS NULL OR id > %(cursor)s)
+              AND (%(name)s IS NULL OR name ILIKE %(name)s)
+              AND (%(instructor)s IS NULL OR instructor = %(instructor)s)
+            ORDER BY id LIMIT %(limit)s
+            ''',
+            {"cursor": cursor_id, "name": pagination.like_prefix(name) if name else None,
+             "instructor": instructor, "limit": limit + 1}
+        )
+        return pagination.finish_page(cursor.fetchall(), limit, response)
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error fetching courses: {error}")
         raise HTTPException(status_code=500, detail="Database error fetching courses.")
@@ -138,6 +235,7 @@ def update_course(
             'UPDATE courses SET name = %s, description = %s, instructor = %s WHERE id = %s',
             (course.name, course.description, course.instructor, course_id)
         )
+        config_cache.bump_version(cursor, 'grades_version')
         conn.commit()
         return {"message": "Course updated successfully", "course": course.model_dump()}
     except HTTPException:
@@ -162,6 +260,7 @@ def delete_course(course_id: int, user: dict = require_staff_or_admin):
             raise HTTPException(status_code=404, detail="Course not found")
 
         cursor.execute('DELETE FROM courses WHERE id = %s', (course_id,))
+        config_cache.bump_version(cursor, 'grades_version')
         conn.commit()
         return {"message": "Course deleted successfully"}
     except HTTPException:
@@ -174,19 +273,147 @@ def delete_course(course_id: int, user: dict = require_staff_or_admin):
         if cursor: cursor.close()
         if conn: conn.close()
 
+# ===============================================
+#  FAQ ENDPOINTS
+# ===============================================
+
+@app.get("/faqs", response_model=List[Faq], tags=["FAQs"])
+def get_all_faqs(user: dict = any_logged_in_user):
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, question, answer, keywords FROM faqs ORDER BY id')
+        return cursor.fetchall()
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error fetching FAQs: {error}")
+        raise HTTPException(status_code=500, detail="Database error fetching FAQs.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+@app.get("/faqs/search", response_model=List[Faq], tags=["FAQs"])
+def search_faqs(q: str, user: dict = any_logged_in_user):
+    """Returns the FAQ entries the chatbot would use for a message."""
+    with database.db_connection() as conn:
+        cursor = conn.cursor()
+        _, faq_version = config_cache.config_cache.get(cursor, 'faq_version')
+        if faq.faq_index.needs_refresh(faq_version):
+            faq.faq_index.refresh(cursor, faq_version)
+    return faq.faq_index.search(q)
+
+@app.post("/faqs", response_model=Faq, tags=["FAQs"])
+def create_faq(faq_data: FaqCreate, user: dict = require_staff_or_admin):
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO faqs (question, answer, keywords) VALUES (%s, %s, %s) RETURNING id, question, answer, keywords',
+            (faq_data.question, faq_data.answer, faq_data.keywords)
+        )
+        new_faq = cursor.fetchone()
+        config_cache.bump_version(cursor, 'faq_version') # Other workers rebuild their index and reply cache keys
+        conn.commit()
+        faq.faq_index.upsert(dict(new_faq))
+        response_cache.response_cache.clear()
+        return new_faq
+    except database.psycopg2.IntegrityError:
+        if conn: conn.rollback()
+        raise HTTPException(status_code=400, detail="An FAQ with this question already exists.")
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error creating FAQ: {error}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail="Database error creating FAQ.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+@app.put("/faqs/{faq_id}", response_model=Faq, tags=["FAQs"])
+def update_faq(faq_id: int, faq_data: FaqCreate, user: dict = require_staff_or_admin):
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE faqs SET question = %s, answer = %s, keywords = %s WHERE id = %s RETURNING id, question, answer, keywords',
+            (faq_data.question, faq_data.answer, faq_data.keywords, faq_id)
+        )
+        updated_faq = cursor.fetchone()
+        if not updated_faq:
+            raise HTTPException(status_code=404, detail="FAQ not found")
+        config_cache.bump_version(cursor, 'faq_version')
+        conn.commit()
+        faq.faq_index.upsert(dict(updated_faq))
+        response_cache.response_cache.clear()
+        return updated_faq
+    except HTTPException:
+         raise
+    except database.psycopg2.IntegrityError:
+        if conn: conn.rollback()
+        raise HTTPException(status_code=400, detail="An FAQ with this question already exists.")
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error updating FAQ {faq_id}: {error}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail="Database error updating FAQ.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+@app.delete("/faqs/{faq_id}", tags=["FAQs"])
+def delete_faq(faq_id: int, user: dict = require_staff_or_admin):
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM faqs WHERE id = %s RETURNING id', (faq_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="FAQ not found")
+        config_cache.bump_version(cursor, 'faq_version')
+        conn.commit()
+        faq.faq_index.remove(faq_id)
+        response_cache.response_cache.clear()
+        return {"message": "FAQ deleted successfully"}
+    except HTTPException:
+         raise
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error deleting FAQ {faq_id}: {error}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail="Database error deleting FAQ.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
 # ===============================================
 #  USER MANAGEMENT ENDPOINTS
 # ===============================================
 
 @app.get("/users", response_model=List[UserDisplay], tags=["User Management"])
-def get_all_users(user: dict = require_admin_only):
+def get_all_users(
+    response: Response,
+    cursor_id: Optional[int] = Query(None, alias="cursor", description="Id from the previous page's X-Next-Cursor header"),
+    limit: int = Depends(pagination.page_size),
+    role: Optional[str] = None,
+    name: Optional[str] = Query(None, description="User name prefix"),
+    user: dict = require_admin_only
+):
+    """Lists users by id, one page at a time."""
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT id, name, email, role FROM users')
-        users = cursor.fetchall()
-        return users
+        cursor.execute(
+            '''
+            SELECT id, name, email, role FROM users
+            WHERE (%(cursor)s IS NULL OR id > %(cursor)s)
+              AND (%(role)s IS NULL OR role = %(role)s)
+              AND (%(name)s IS NULL OR name ILIKE %(name)s)
+            ORDER BY id LIMIT %(limit)s
+            ''',
+            {"cursor": cursor_id, "role": role, "name": pagination.like_prefix(name) if name else None,
+             "limit": limit + 1}
+        )
+        return pagination.finish_page(cursor.fetchall(), limit, response)
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error fetching all users: {error}")
         raise HTTPException(status_code=500, detail="Database error fetching users.")
@@ -210,7 +437,9 @@ def delete_user(user_id: int, user: dict = require_admin_only):
             raise HTTPException(status_code=404, detail="User not found")
 
         cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
+        config_cache.bump_version(cursor, 'grades_version') # Their marks go with them
         conn.commit()
+        invalidate_cached_user(user_id=user_id)
         return {"message": "User deleted successfully"}
     except HTTPException:
          raise
@@ -226,113 +455,244 @@ def delete_user(user_id: int, user: dict = require_admin_only):
 #  CHATBOT ENDPOINT (GEMINI & PROMPT CUSTOMIZATION)
 # ===============================================
 
-@app.post("/chat", response_model=Chat, tags=["Chatbot"])
-def handle_chat(
-    query: ChatQuery,
-    user: dict = any_logged_in_user
-):
-    user_message = query.message
-    user_id = user['id'] 
-
-    if not GOOGLE_API_KEY:
-        raise HTTPException(status_code=500, detail="AI service is not configured.")
-
-    # --- Language Detection ---
-    detected_language = "en"
-    try:
-        detected_language = detect(user_message)
-    except LangDetectException:
-        print("Language detection failed, defaulting to English.")
-
-    faq_context = ""
-    user_msg_lower = user_message.lower()
-    faq_keywords = {
-        "library hours": ["library", "hours", "open", "close"],
-        "admission deadline": ["admission", "deadline", "apply", "application"],
-        "gym access": ["gym", "fitness", "sports", "access"]
-    }
-    for faq_key, keywords in faq_keywords.items():
-        if any(word in user_msg_lower for word in keywords):
-            faq_context = f"Relevant Information: {FAQ_DATA[faq_key]}"; break
-
+def _load_chat_context(user_id: int):
+    """
+    Blocking DB work for a chat turn: system prompt, FAQ version and the history window.
+    Returns (system_prompt, faq_version, summary, window_rows, overflow_rows).
+    """
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
 
-        # --- 1. Fetch System Prompt from DB (NEW) ---
-        cursor.execute("SELECT value FROM system_config WHERE key = 'system_prompt'")
-        prompt_row = cursor.fetchone()
-        if prompt_row:
-            system_prompt_base = prompt_row['value']
-        else:
-            system_prompt_base = "You are a helpful college chatbot." 
+        # --- 1. System Prompt (cached per process, re-read only when its version changes) ---
+        system_prompt_base, _ = config_cache.config_cache.get(cursor, 'system_prompt')
 
-        cursor.execute(
-            'SELECT message, response FROM conversations WHERE user_id = %s ORDER BY timestamp ASC',
-            (user_id,)
-        )
-        history_rows = cursor.fetchall()
-        
-        system_prompt = f"{system_prompt_base} Please respond in {detected_language}." 
-        if faq_context:
-            system_prompt += f" {faq_context}"
-        
-        gemini_history = []
-        for row in history_rows:
-            gemini_history.append({"role": "user", "parts": [{"text": row['message']}]})
-            gemini_history.append({"role": "model", "parts": [{"text": row['response']}]})
+        # --- 2. Recent turns + rolling summary of older ones ---
+        summary, _, window_rows, overflow_rows = chat_history.load_history_window(cursor, user_id)
 
-        try:
-            model = genai.GenerativeModel(
-                model_name='gemini-2.5-flash-preview-09-2025', 
-                system_instruction=system_prompt
-            )
-            chat = model.start_chat(history=gemini_history)
-            response = chat.send_message(user_message)
-            bot_response = response.text
-            
-        except Exception as e:
-            print(f"Google Gemini API error: {e}")
-            raise HTTPException(status_code=500, detail="Error connecting to AI service.")
+        # --- 3. FAQ index (built on first use, rebuilt when any worker edits FAQs) ---
+        _, faq_version = config_cache.config_cache.get(cursor, 'faq_version')
+        if faq.faq_index.needs_refresh(faq_version):
+            faq.faq_index.refresh(cursor, faq_version)
+        return system_prompt_base, faq_version, summary, window_rows, overflow_rows
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
 
-        # --- Save conversation to database ---
+def _save_chat(user_id: int, user_message: str, bot_response: str):
+    """Blocking DB work: stores a finished chat turn and returns the saved row."""
+    if chat_writer.conversation_writer.running:
+        return chat_writer.conversation_writer.submit(user_id, user_message, bot_response)
+
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
         cursor.execute(
-            'INSERT INTO conversations (user_id, message, response) VALUES (%s, %s, %s) RETURNING id',
+            'INSERT INTO conversations (user_id, message, response) VALUES (%s, %s, %s) RETURNING *',
             (user_id, user_message, bot_response)
         )
-        new_chat_id_row = cursor.fetchone()
-        if not new_chat_id_row: raise HTTPException(status_code=500, detail="Failed to save chat.")
-        new_chat_id = new_chat_id_row['id']
+        new_chat = cursor.fetchone()
+        if not new_chat: raise HTTPException(status_code=500, detail="Failed to save chat.")
         conn.commit()
+        return new_chat
+    except Exception:
+        if conn: conn.rollback()
+        raise
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
 
-        # --- Get new conversation to return it ---
-        cursor.execute('SELECT * FROM conversations WHERE id = %s', (new_chat_id,))
-        new_chat = cursor.fetchone()
-        if not new_chat: raise HTTPException(status_code=404, detail="Saved chat not found.")
+async def _start_chat_session(user_message: str, user_id: int):
+    """
+    Shared setup for /chat and /chat/stream: detects the language, picks FAQ
+    context, loads the history window and, unless the response cache already
+    has an answer, opens a Gemini chat session.
+    Returns a dict with 'chat', 'prompt' (the message to send, with this
+    turn's context), 'cached_response', 'cache_key', 'cacheable', 'summary'
+    and 'overflow_rows'.
+    """
+    if not llm.is_configured():
+        raise HTTPException(status_code=500, detail="AI service is not configured.")
+
+    # --- Language Detection ---
+    with tracing.span("chat.language_detection") as stage:
+        detected_language = await run_in_threadpool(language.language_detector.detect, user_message, user_id)
+        if stage: stage.set("language", detected_language)
+
+    # DB work runs on the threadpool so the event loop stays free
+    with tracing.span("chat.load_context"):
+        system_prompt_base, faq_version, summary, window_rows, overflow_rows = await run_in_threadpool(_load_chat_context, user_id)
+    session = {
+        "chat": None, "prompt": user_message, "cached_response": None, "summary": summary,
+        "overflow_rows": overflow_rows, "cache_key": None, "cacheable": response_cache.is_cacheable(summary, window_rows),
+    }
+
+    # --- Answer repeated questions from the response cache ---
+    # Looked up for every user; only replies generated without personal context are stored
+    if response_cache.RESPONSE_CACHE_ENABLED:
+        session["cache_key"] = (user_message, detected_language, response_cache.prompt_version(system_prompt_base, faq_version))
+        with tracing.span("chat.response_cache") as stage:
+            session["cached_response"] = response_cache.response_cache.get(*session["cache_key"])
+            if stage: stage.set("hit", session["cached_response"] is not None)
+        if session["cached_response"] is not None:
+            return session
+    
+    # Per-message instructions travel with the message itself, so the model
+    # only depends on the base prompt and can be reused across requests
+    with tracing.span("chat.faq_search"):
+        faq_context = faq.faq_context(faq.faq_index.search(user_message))
+    turn_context = f"Please respond in {detected_language}." 
+    if faq_context:
+        turn_context += f" {faq_context}"
+    turn_context += chat_history.summary_instruction(summary)
+    
+    session["prompt"] = f"{user_message}\n\n(Context for this reply: {turn_context})"
+    gemini_history = chat_history.build_gemini_history(window_rows)
+
+    try:
+        # Shared model from the registry, built once per system prompt
+        model = llm.get_model(system_instruction=system_prompt_base)
+        session["chat"] = model.start_chat(history=gemini_history)
+    except Exception as e:
+        print(f"Google Gemini API error: {e}")
+        raise HTTPException(status_code=500, detail="Error connecting to AI service.")
+    return session
+
+def _remember_response(session: dict, bot_response: str):
+    if session["cacheable"] and session["cache_key"] is not None and session["cached_response"] is None:
+        response_cache.response_cache.put(*session["cache_key"], bot_response)
+
+@app.post("/chat", response_model=Chat, tags=["Chatbot"])
+async def handle_chat(
+    query: ChatQuery,
+    background_tasks: BackgroundTasks,
+    user: dict = any_logged_in_user
+):
+    user_message = query.message
+    user_id = user['id'] 
+
+    try:
+        session = await _start_chat_session(user_message, user_id)
+
+        bot_response = session["cached_response"]
+        if bot_response is None:
+            try:
+                with tracing.span("llm.chat"):
+                    bot_response = await llm.send_chat_message(session["chat"], session["prompt"])
+                
+            except Exception as e:
+                print(f"Google Gemini API error: {e}")
+                raise HTTPException(status_code=500, detail="Error connecting to AI service.")
+            _remember_response(session, bot_response)
+
+        # --- Save conversation to database ---
+        with tracing.span("chat.save"):
+            new_chat = await run_in_threadpool(_save_chat, user_id, user_message, bot_response)
+
+        if chat_history.needs_summary_update(session["overflow_rows"]):
+            background_tasks.add_task(chat_history.fold_into_summary, user_id, session["summary"], session["overflow_rows"])
         return new_chat
 
     except HTTPException: raise
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error handling chat: {error}")
-        if conn: conn.rollback()
         raise HTTPException(status_code=500, detail="Database error handling chat.")
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream", tags=["Chatbot"])
+async def handle_chat_stream(
+    query: ChatQuery,
+    background_tasks: BackgroundTasks,
+    user: dict = any_logged_in_user
+):
+    """
+    Streaming variant of /chat. Sends the reply as Server-Sent Events:
+    'delta' events with text chunks as Gemini produces them, then one 'done'
+    event with the saved chat row (or an 'error' event if the stream fails).
+    """
+    user_message = query.message
+    user_id = user['id'] 
+
+    try:
+        session = await _start_chat_session(user_message, user_id)
+    except HTTPException: raise
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error handling chat: {error}")
+        raise HTTPException(status_code=500, detail="Database error handling chat.")
+
+    async def event_stream():
+        chunks = []
+        if session["cached_response"] is not None:
+            chunks.append(session["cached_response"])
+            yield _sse_event("delta", {"text": session["cached_response"]})
+        else:
+            try:
+                with tracing.span("llm.chat_stream"):
+                    async for text in llm.stream_chat_message(session["chat"], session["prompt"]):
+                        chunks.append(text)
+                        yield _sse_event("delta", {"text": text})
+            except Exception as e:
+                print(f"Google Gemini API error (stream): {e}")
+                yield _sse_event("error", {"detail": "Error connecting to AI service."})
+                return
+            _remember_response(session, "".join(chunks))
+
+        # --- Save the finished conversation to database ---
+        try:
+            with tracing.span("chat.save"):
+                new_chat = await run_in_threadpool(_save_chat, user_id, user_message, "".join(chunks))
+        except Exception as error:
+            print(f"DB Error saving streamed chat: {error}")
+            yield _sse_event("error", {"detail": "Database error handling chat."})
+            return
+
+        if chat_history.needs_summary_update(session["overflow_rows"]):
+            background_tasks.add_task(chat_history.fold_into_summary, user_id, session["summary"], session["overflow_rows"])
+        yield _sse_event("done", Chat.model_validate(new_chat).model_dump(mode="json"))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
 
 @app.get("/chat/history", response_model=List[Chat], tags=["Chatbot"])
-def get_chat_history(user: dict = any_logged_in_user):
+def get_chat_history(
+    response: Response,
+    cursor_id: Optional[int] = Query(None, alias="cursor", description="Id from the previous page's X-Next-Cursor header"),
+    limit: int = Depends(pagination.page_size),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user: dict = any_logged_in_user
+):
+    """
+    Returns the most recent conversations first page by page (each page is in
+    chronological order); the cursor walks back to older messages.
+    """
     user_id = user['id']
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            'SELECT * FROM conversations WHERE user_id = %s ORDER BY timestamp ASC',
-            (user_id,)
+            '''
+            SELECT * FROM conversations
+            WHERE user_id = %(user_id)s
+              AND (%(cursor)s IS NULL OR id < %(cursor)s)
+              AND (%(since)s IS NULL OR timestamp >= %(since)s)
+              AND (%(until)s IS NULL OR timestamp < %(until)s)
+            ORDER BY id DESC LIMIT %(limit)s
+            ''',
+            {"user_id": user_id, "cursor": cursor_id, "since": since, "until": until, "limit": limit + 1}
         )
-        history = cursor.fetchall()
+        history = pagination.finish_page(cursor.fetchall(), limit, response)
+        history.reverse()
         return history
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error fetching chat history: {error}")
@@ -422,14 +782,29 @@ def get_instructor_schedule(instructor_name: str, user: dict = any_logged_in_use
 # ===============================================
 
 @app.get("/students", response_model=List[UserDisplay], tags=["Staff Features"])
-def get_all_students(user: dict = require_staff_or_admin):
+def get_all_students(
+    response: Response,
+    cursor_id: Optional[int] = Query(None, alias="cursor", description="Id from the previous page's X-Next-Cursor header"),
+    limit: int = Depends(pagination.page_size),
+    name: Optional[str] = Query(None, description="Student name prefix"),
+    user: dict = require_staff_or_admin
+):
+    """Lists students by id, one page at a time."""
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, name, email, role FROM users WHERE role = 'student'")
-        students = cursor.fetchall()
-        return students
+        cursor.execute(
+            '''
+            SELECT id, name, email, role FROM users
+            WHERE role = 'student'
+              AND (%(cursor)s IS NULL OR id > %(cursor)s)
+              AND (%(name)s IS NULL OR name ILIKE %(name)s)
+            ORDER BY id LIMIT %(limit)s
+            ''',
+            {"cursor": cursor_id, "name": pagination.like_prefix(name) if name else None, "limit": limit + 1}
+        )
+        return pagination.finish_page(cursor.fetchall(), limit, response)
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error fetching students: {error}")
         raise HTTPException(status_code=500, detail="Database error fetching students.")
@@ -463,6 +838,7 @@ def upsert_internal_marks(
             (marks_data.student_id, marks_data.course_id, 
              marks_data.internal_1, marks_data.internal_2, marks_data.internal_3)
         )
+        config_cache.bump_version(cursor, 'grades_version')
         conn.commit()
         return {"message": "Marks updated successfully."}
     except (Exception, database.psycopg2.DatabaseError) as error:
@@ -473,6 +849,90 @@ def upsert_internal_marks(
         if cursor: cursor.close()
         if conn: conn.close()
 
+def _bulk_upsert_marks(body: bytes, content_type: str):
+    """Blocking work for the bulk marks import: validate, COPY into staging, merge."""
+    import pandas as pd # Slow to import; only the bulk endpoints need it
+    try:
+        df = bulk.read_rows(body, content_type)
+        errors = {}
+        marks = pd.DataFrame({
+            "student_id": bulk.integer_column(df, "student_id", errors),
+            "course_id": bulk.integer_column(df, "course_id", errors),
+        })
+        for field in ("internal_1", "internal_2", "internal_3"):
+            minimum, maximum = bulk.field_bounds(InternalMarkCreate, field)
+            marks[field] = bulk.integer_column(df, field, errors, minimum, maximum, default=0)
+    except bulk.BulkParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    marks = marks.drop(index=list(errors))
+    # A later row for the same student/course wins, as with one-by-one upserts
+    superseded = marks.duplicated(subset=["student_id", "course_id"], keep="last")
+    for row in marks.index[superseded]:
+        errors[int(row)] = "Superseded by a later row for the same student and course."
+    marks = marks[~superseded]
+
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TEMP TABLE marks_import (
+                row_number INTEGER, student_id INTEGER, course_id INTEGER,
+                internal_1 INTEGER, internal_2 INTEGER, internal_3 INTEGER
+            ) ON COMMIT DROP
+        ''')
+        buffer = io.StringIO()
+        marks.to_csv(buffer, header=False, index=True)
+        buffer.seek(0)
+        cursor.copy_expert(
+            'COPY marks_import (row_number, student_id, course_id, internal_1, internal_2, internal_3) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+
+        cursor.execute('''
+            SELECT i.row_number FROM marks_import i
+            WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.id = i.student_id)
+               OR NOT EXISTS (SELECT 1 FROM courses c WHERE c.id = i.course_id)
+        ''')
+        for row in cursor.fetchall():
+            errors[row['row_number']] = "Unknown student_id or course_id."
+
+        cursor.execute('''
+            INSERT INTO internal_marks (student_id, course_id, internal_1, internal_2, internal_3)
+            SELECT i.student_id, i.course_id, i.internal_1, i.internal_2, i.internal_3
+            FROM marks_import i
+            JOIN users u ON u.id = i.student_id
+            JOIN courses c ON c.id = i.course_id
+            ON CONFLICT (student_id, course_id)
+            DO UPDATE SET
+                internal_1 = EXCLUDED.internal_1,
+                internal_2 = EXCLUDED.internal_2,
+                internal_3 = EXCLUDED.internal_3
+        ''')
+        imported = cursor.rowcount
+        config_cache.bump_version(cursor, 'grades_version')
+        conn.commit()
+        return {"received": len(df), "imported": imported, "errors": bulk.error_list(errors)}
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error importing marks: {error}")
+        if conn: conn.rollback()
+        raise HTTPException(status_code=500, detail="Database error importing marks.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
+
+@app.post("/marks/internal/bulk", tags=["Staff Features"])
+async def bulk_upsert_internal_marks(request: Request, user: dict = require_staff_or_admin):
+    """
+    Adds or updates many students' internal marks in one transaction.
+    Body is CSV (Content-Type: text/csv) or JSON lines (application/x-ndjson)
+    with student_id, course_id, internal_1, internal_2, internal_3.
+    Returns per-row errors; valid rows are imported.
+    """
+    body = await request.body()
+    return await run_in_threadpool(_bulk_upsert_marks, body, request.headers.get("content-type", ""))
+
 @app.get("/reports/course-status/{course_id}", tags=["Reports", "Staff Features"])
 def get_student_status_for_course(course_id: int, user: dict = require_staff_or_admin):
     """
@@ -557,19 +1017,19 @@ def enroll_student_in_course(
         conn = database.get_db_connection()
         cursor = conn.cursor()
 
+        # One statement, so concurrent requests for the same pair can't both pass a check
         cursor.execute(
-            "SELECT id FROM enrollments WHERE student_id = %s AND course_id = %s",
-            (enrollment_data.student_id, enrollment_data.course_id)
-        )
-        existing = cursor.fetchone()
-        if existing:
-            raise HTTPException(status_code=400, detail="Student is already enrolled in this course.")
-
-        cursor.execute(
-            "INSERT INTO enrollments (student_id, course_id) VALUES (%s, %s)",
+            """
+            INSERT INTO enrollments (student_id, course_id) VALUES (%s, %s)
+            ON CONFLICT (student_id, course_id) DO NOTHING
+            RETURNING id
+            """,
             (enrollment_data.student_id, enrollment_data.course_id)
         )
+        inserted = cursor.fetchone()
         conn.commit()
+        if not inserted:
+            raise HTTPException(status_code=400, detail="Student is already enrolled in this course.")
         
     except database.psycopg2.IntegrityError as e: 
          if conn: conn.rollback()
@@ -586,126 +1046,247 @@ def enroll_student_in_course(
 
     return {"message": "Student enrolled successfully."}
 
-@app.get("/reports/student-summary/{student_id}", tags=["Reports", "Staff Features"])
-def get_student_summary(student_id: int, user: dict = require_staff_or_admin):
+@app.post("/enrollments/bulk", tags=["Staff Features"])
+def bulk_enroll_students(
+    enrollment_data: BulkEnrollmentCreate,
+    user: dict = require_staff_or_admin
+):
     """
-    Generates a comprehensive AI summary for a specific student.
-    (Staff or Admin only)
+    Enrolls many students in many courses in one statement. Existing
+    enrollments and unknown IDs are reported rather than failing the request.
     """
+    requested = [(student_id, course_id) for student_id in enrollment_data.student_ids for course_id in enrollment_data.course_ids]
+    requested += [(pair.student_id, pair.course_id) for pair in enrollment_data.pairs]
+    requested = list(dict.fromkeys(requested)) # De-duplicate, keep order
+    if not requested:
+        raise HTTPException(status_code=400, detail="No enrollments requested.")
+    if len(requested) > bulk.BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {bulk.BULK_MAX_ROWS} enrollments per request.")
+
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-
-        # Get Student Info
-        cursor.execute("SELECT name, email FROM users WHERE id = %s AND role = 'student'", (student_id,))
-        student = cursor.fetchone()
-        if not student:
-            raise HTTPException(status_code=404, detail="Student not found.")
-        
-        # Get Student's Internal Marks
+        # Insert-or-skip and classify every requested pair in a single round-trip
         cursor.execute('''
-            SELECT c.name as course_name, m.internal_1, m.internal_2, m.internal_3
-            FROM internal_marks m
-            JOIN courses c ON m.course_id = c.id
-            WHERE m.student_id = %s
-        ''', (student_id,))
-        marks = cursor.fetchall()
-
-        # Get Student's Enrolled Courses
-        cursor.execute('''
-            SELECT c.name as course_name, c.instructor
-            FROM enrollments e
-            JOIN courses c ON e.course_id = c.id
-            WHERE e.student_id = %s
-        ''', (student_id,))
-        enrollments = cursor.fetchall()
-
-        # Get Student's Recent Chat History (e.g., last 10 messages)
-        cursor.execute(
-            'SELECT message, response FROM conversations WHERE user_id = %s ORDER BY timestamp DESC LIMIT 10',
-            (student_id,)
-        )
-        chat_history = cursor.fetchall()
-
-        # Build the Prompt for the AI 
-        prompt = f"""
-        You are an academic advisor. Analyze the following student's data and provide a 3-4 sentence professional summary of their academic progress, engagement, and any potential areas of concern.
+            WITH requested AS (
+                SELECT * FROM unnest(%s::int[], %s::int[]) AS r(student_id, course_id)
+            ),
+            inserted AS (
+                INSERT INTO enrollments (student_id, course_id)
+                SELECT r.student_id, r.course_id
+                FROM requested r
+                JOIN users u ON u.id = r.student_id
+                JOIN courses c ON c.id = r.course_id
+                ON CONFLICT (student_id, course_id) DO NOTHING
+                RETURNING student_id, course_id
+            )
+            SELECT
+                r.student_id, r.course_id,
+                CASE
+                    WHEN i.student_id IS NOT NULL THEN 'enrolled'
+                    WHEN NOT EXISTS (SELECT 1 FROM users u WHERE u.id = r.student_id)
+                      OR NOT EXISTS (SELECT 1 FROM courses c WHERE c.id = r.course_id) THEN 'invalid'
+                    ELSE 'already_enrolled'
+                END as status
+            FROM requested r
+            LEFT JOIN inserted i ON i.student_id = r.student_id AND i.course_id = r.course_id
+        ''', ([pair[0] for pair in requested], [pair[1] for pair in requested]))
+        rows = cursor.fetchall()
+        conn.commit()
 
-        STUDENT DATA:
-        - Name: {student['name']}
-        - Email: {student['email']}
+        result = {"enrolled": [], "already_enrolled": [], "invalid": []}
+        for row in rows:
+            result[row['status']].append({"student_id": row['student_id'], "course_id": row['course_id']})
+        return result
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        if conn: conn.rollback()
+        print(f"DB Error bulk enrolling students: {error}")
+        raise HTTPException(status_code=500, detail="Database error enrolling students.")
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
 
-        ENROLLED COURSES:
-        """
-        if enrollments:
-            for course in enrollments:
-                prompt += f"- {course['course_name']} (with {course['instructor']})\n"
-        else:
-            prompt += "- Not enrolled in any courses.\n"
+def _load_student_data(student_id: int):
+    """Blocking DB work: the student's profile, marks, enrollments and recent chats in one query."""
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        student_data = student_summary.fetch_students_data(cursor, [student_id]).get(student_id)
+        if not student_data:
+            raise HTTPException(status_code=404, detail="Student not found.")
+        return student_data
+    finally:
+        if cursor: cursor.close()
+        if conn: conn.close()
 
-        prompt += "\nINTERNAL MARKS (out of 25 each):\n"
-        if marks:
-            for mark in marks:
-                total = mark['internal_1'] + mark['internal_2'] + mark['internal_3']
-                prompt += f"- {mark['course_name']}: I1: {mark['internal_1']}, I2: {mark['internal_2']}, I3: {mark['internal_3']} (Total: {total}/75)\n"
-        else:
-            prompt += "- No marks recorded.\n"
+@app.get("/reports/student-summary/{student_id}", tags=["Reports", "Staff Features"])
+async def get_student_summary(student_id: int, user: dict = require_staff_or_admin):
+    """
+    Generates a comprehensive AI summary for a specific student.
+    Summaries are cached until the student's data changes.
+    (Staff or Admin only)
+    """
+    try:
+        with tracing.span("summary.load_data"):
+            student_data = await run_in_threadpool(_load_student_data, student_id)
 
-        prompt += "\nRECENT CHATBOT ENGAGEMENT (User message -> Bot response):\n"
-        if chat_history:
-            for chat in reversed(chat_history): 
-                prompt += f"- User: \"{chat['message']}\" -> Bot: \"{chat['response']}\"\n"
-        else:
-            prompt += "- No recent chat history.\n"
-        
-        prompt += "\nSUMMARY:"
+        data_fingerprint = student_summary.fingerprint(student_data)
+        cached_summary = student_summary.get_cached_summary(student_id, data_fingerprint)
+        if cached_summary is not None:
+            return {"summary": cached_summary, "cached": True}
 
-        if not GOOGLE_API_KEY:
+        if not llm.is_configured():
              raise HTTPException(status_code=500, detail="AI service is not configured.")
 
         # Call Gemini AI 
         try:
-            model = genai.GenerativeModel(model_name='gemini-2.5-flash-preview-09-2025')
-            response = model.generate_content(prompt)
-            summary_text = response.text
+            with tracing.span("llm.generate"):
+                summary_text = await llm.generate(student_summary.build_prompt(student_data))
         except Exception as e:
             print(f"Google Gemini API error (Summary): {e}")
             raise HTTPException(status_code=500, detail="Error connecting to AI service for summary.")
 
-        return {"summary": summary_text}
+        student_summary.cache_summary(student_id, data_fingerprint, summary_text)
+        return {"summary": summary_text, "cached": False}
 
     except HTTPException:
          raise
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error generating summary: {error}")
         raise HTTPException(status_code=500, detail="Database error generating summary.")
+
+def _load_students_data(student_ids):
+    conn = None; cursor = None
+    try:
+        conn = database.get_db_connection()
+        cursor = conn.cursor()
+        return student_summary.fetch_students_data(cursor, student_ids)
     finally:
         if cursor: cursor.close()
         if conn: conn.close()
 
+def _resolve_batch_students(batch: SummaryBatchRequest):
+    """Blocking DB work: expands a course into its enrolled students."""
+    student_ids = list(batch.student_ids)
+    if batch.course_id is not None:
+        conn = None; cursor = None
+        try:
+            conn = database.get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT student_id FROM enrollments WHERE course_id = %s ORDER BY student_id', (batch.course_id,))
+            student_ids += [row['student_id'] for row in cursor.fetchall()]
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+    return list(dict.fromkeys(student_ids)) # De-duplicate, keep order
+
+@app.post("/reports/student-summaries", tags=["Reports", "Staff Features"])
+async def start_student_summaries(batch: SummaryBatchRequest, user: dict = require_staff_or_admin):
+    """
+    Starts generating AI summaries for a course's students and/or a list of
+    student IDs. Returns a job ID; poll GET /reports/student-summaries/{job_id}
+    or follow /reports/student-summaries/{job_id}/stream for results.
+    (Staff or Admin only)
+    """
+    if not llm.is_configured():
+        raise HTTPException(status_code=500, detail="AI service is not configured.")
+    try:
+        student_ids = await run_in_threadpool(_resolve_batch_students, batch)
+    except (Exception, database.psycopg2.DatabaseError) as error:
+        print(f"DB Error resolving summary batch: {error}")
+        raise HTTPException(status_code=500, detail="Database error starting summaries.")
+
+    if not student_ids:
+        raise HTTPException(status_code=400, detail="No students to summarise.")
+    if len(student_ids) > student_summary.SUMMARY_BATCH_MAX_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"At most {student_summary.SUMMARY_BATCH_MAX_STUDENTS} students per batch.")
+
+    job = student_summary.start_summary_job(student_ids, _load_students_data)
+    return {"job_id": job.id, "total": len(student_ids)}
+
+@app.get("/reports/student-summaries/{job_id}", tags=["Reports", "Staff Features"])
+def get_student_summaries(job_id: str, since: int = Query(default=0, ge=0), user: dict = require_staff_or_admin):
+    """Job status plus results completed so far (from index 'since' onward)."""
+    job = student_summary.get_summary_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Summary job not found.")
+    return job.snapshot(since)
+
+@app.get("/reports/student-summaries/{job_id}/stream", tags=["Reports", "Staff Features"])
+async def stream_student_summaries(job_id: str, user: dict = require_staff_or_admin):
+    """Server-Sent Events: one 'result' event per student as it completes, then 'done'."""
+    job = student_summary.get_summary_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Summary job not found.")
+
+    async def event_stream():
+        async for result in job.follow():
+            yield _sse_event("result", result)
+        snapshot = job.snapshot(len(job.results))
+        yield _sse_event("done", {key: snapshot[key] for key in ("status", "error", "total", "completed")})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Grade distribution reports, keyed by bucket size and tagged with the
+# 'grades_version' they were built from. Anything that changes marks or
+# courses bumps that version, which makes the cached copies stale.
+_grade_report_cache = {} # bucket_size -> (grades_version, report)
+
 @app.get("/reports/grade-distribution", tags=["Reports"])
-def get_grade_distribution_report(user: dict = require_staff_or_admin):
+def get_grade_distribution_report(
+    bucket_size: Optional[int] = Query(default=None, ge=1, le=75),
+    user: dict = require_staff_or_admin
+):
+    """
+    Pass/fail counts per course. With bucket_size, also includes a histogram
+    of total marks per course (e.g. bucket_size=15 gives "0-14", "15-29", ...).
+    """
     conn = None; cursor = None
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, name FROM courses")
-        courses = cursor.fetchall()
-        report_data = {}
-        for course in courses:
-            course_id = course['id']
-            course_name = course['name']
 
-            cursor.execute(
-                "SELECT (internal_1 + internal_2 + internal_3) as total FROM internal_marks WHERE course_id = %s", 
-                (course_id,)
-            )
-            totals = cursor.fetchall()
-            pass_mark = 26.25
-            status_counts = Counter("Pass" if row['total'] >= pass_mark else "Fail" for row in totals)
-            report_data[course_name] = dict(status_counts)
+        _, grades_version = config_cache.config_cache.get(cursor, 'grades_version')
+        cached = _grade_report_cache.get(bucket_size)
+        if cached and cached[0] == grades_version:
+            return cached[1]
+
+        # One aggregated query for every course (and bucket, if requested)
+        pass_mark = 26.25
+        bucket_expr = "(m.internal_1 + m.internal_2 + m.internal_3) / %s" if bucket_size else "NULL"
+        query_params = (bucket_size, pass_mark, pass_mark) if bucket_size else (pass_mark, pass_mark)
+        cursor.execute(f'''
+            SELECT
+                c.id, c.name, {bucket_expr} as bucket,
+                COUNT(m.id) as total_count,
+                SUM(CASE WHEN (m.internal_1 + m.internal_2 + m.internal_3) >= %s THEN 1 ELSE 0 END) as pass_count,
+                SUM(CASE WHEN (m.internal_1 + m.internal_2 + m.internal_3) < %s THEN 1 ELSE 0 END) as fail_count
+            FROM courses c
+            LEFT JOIN internal_marks m ON m.course_id = c.id
+            GROUP BY c.id, c.name, bucket
+            ORDER BY c.id, bucket
+        ''', query_params)
+        rows = cursor.fetchall()
 
+        report_data = {}
+        for row in rows:
+            course_report = report_data.setdefault(row['name'], {})
+            for outcome, count in (("Pass", row['pass_count']), ("Fail", row['fail_count'])):
+                if count:
+                    course_report[outcome] = course_report.get(outcome, 0) + count
+            if bucket_size:
+                histogram = course_report.setdefault("histogram", {})
+                if row['total_count']:
+                    low = row['bucket'] * bucket_size
+                    histogram[f"{low}-{low + bucket_size - 1}"] = row['total_count']
+
+        _grade_report_cache[bucket_size] = (grades_version, report_data)
         return report_data
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error generating grade report: {error}")
@@ -768,11 +1349,11 @@ def get_system_prompt(user: dict = require_admin_only):
     try:
         conn = database.get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT value FROM system_config WHERE key = 'system_prompt'")
+        cursor.execute("SELECT value, version FROM system_config WHERE key = 'system_prompt'")
         prompt_row = cursor.fetchone()
         if not prompt_row:
             raise HTTPException(status_code=404, detail="System prompt not found.")
-        return {"prompt": prompt_row['value']}
+        return {"prompt": prompt_row['value'], "version": prompt_row['version']}
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error fetching prompt: {error}")
         raise HTTPException(status_code=500, detail="Database error fetching prompt.")
@@ -780,6 +1361,68 @@ def get_system_prompt(user: dict = require_admin_only):
         if cursor: cursor.close()
         if conn: conn.close()
 
+@app.get("/admin/db-pool", tags=["Admin Features"])
+def get_db_pool_stats(user: dict = require_admin_only):
+    """Gets connection pool size and wait-time statistics. (Admin only)"""
+    return database.pool_stats()
+
+@app.get("/admin/user-cache", tags=["Admin Features"])
+def get_user_cache_stats(user: dict = require_admin_only):
+    """Gets hit/miss statistics for the authenticated-user cache. (Admin only)"""
+    return user_cache_stats()
+
+@app.get("/admin/hashing", tags=["Admin Features"])
+def get_hashing_stats(user: dict = require_admin_only):
+    """Gets queue depth and latency for the password hashing pool. (Admin only)"""
+    return auth_utils.hashing_stats()
+
+@app.get("/admin/response-cache", tags=["Admin Features"])
+def get_response_cache_stats(user: dict = require_admin_only):
+    """Gets hit-rate statistics for the chatbot response cache. (Admin only)"""
+    return response_cache.response_cache.stats()
+
+@app.get("/admin/llm", tags=["Admin Features"])
+def get_llm_stats(user: dict = require_admin_only):
+    """Gets call counts, errors and latency for Gemini calls. (Admin only)"""
+    return llm.llm_stats()
+
+@app.get("/admin/chat-writer", tags=["Admin Features"])
+def get_chat_writer_stats(user: dict = require_admin_only):
+    """Gets queue depth and batch counts for conversation write-behind. (Admin only)"""
+    return chat_writer.conversation_writer.stats()
+
+@app.get("/admin/language-detection", tags=["Admin Features"])
+def get_language_detection_stats(user: dict = require_admin_only):
+    """Gets how often each language-detection path was taken. (Admin only)"""
+    return language.language_detector.stats()
+
+@app.get("/admin/tracing", tags=["Admin Features"])
+def get_tracing_stats(user: dict = require_admin_only):
+    """Gets how many traces were exported, dropped or failed to export. (Admin only)"""
+    return {**tracing.exporter.stats(), "enabled": tracing.TRACING_ENABLED, "sample_rate": tracing.TRACE_SAMPLE_RATE}
+
+@app.get("/admin/slow-queries", tags=["Admin Features"])
+def get_slow_queries(
+    limit: int = Query(default=20, ge=1, le=200),
+    order_by: str = Query(default="total", pattern="^(total|mean|max|calls)$"),
+    user: dict = require_admin_only
+):
+    """
+    Gets the top SQL statements by total, mean or max time (or call count),
+    plus the most recent slow queries with their EXPLAIN plans. (Admin only)
+    """
+    return {
+        **query_log.stats(),
+        "top_statements": query_log.top_statements(limit, order_by),
+        "recent_slow_queries": query_log.recent_slow_queries(),
+    }
+
+@app.delete("/admin/slow-queries", tags=["Admin Features"])
+def reset_slow_queries(user: dict = require_admin_only):
+    """Clears the statement statistics, e.g. before a benchmark run. (Admin only)"""
+    query_log.reset()
+    return {"message": "Query statistics cleared successfully"}
+
 @app.put("/admin/prompt", tags=["Admin Features"])
 def update_system_prompt(
     prompt_data: PromptUpdate,
@@ -791,10 +1434,14 @@ def update_system_prompt(
         conn = database.get_db_connection()
         cursor = conn.cursor()
         cursor.execute(
-            "UPDATE system_config SET value = %s WHERE key = 'system_prompt'",
+            "UPDATE system_config SET value = %s, version = version + 1 WHERE key = 'system_prompt'",
             (prompt_data.prompt,)
         )
+        config_cache.notify_config_changed(cursor, 'system_prompt')
         conn.commit()
+        config_cache.config_cache.invalidate('system_prompt')
+        # Entries are keyed by prompt version, so old ones could never hit again
+        response_cache.response_cache.clear()
         return {"message": "System prompt updated successfully."}
     except (Exception, database.psycopg2.DatabaseError) as error:
         print(f"DB Error updating prompt: {error}")
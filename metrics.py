@@ -0,0 +1,234 @@
+from bisect import bisect_left
+from decouple import config
+import threading
+import time
+
+# --- Metrics ---
+# Minimal Prometheus-style counters and histograms, rendered by /metrics in the
+# text exposition format. Each label combination gets its child (with its
+# bucket array) once; after that, recording is an index lookup and a few adds.
+# Components that already keep stats dicts are exported through collectors
+# read at scrape time, so they cost nothing per request.
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Bearer token for /metrics. The endpoint is not served without one: the
+# metrics reveal traffic, user counts and internal component state.
+METRICS_TOKEN = config('METRICS_TOKEN', default=None)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = [] # Every Counter / Histogram, in registration order
+_collectors = [] # (prefix, stats function, counter keys)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("_lock", "_upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds):
+        self._lock = threading.Lock()
+        self._upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1) # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {} # label values tuple -> child
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def labels(self, *values):
+        """Child for these label values (positional, in labelnames order)."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {child.value}")
+        return lines
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for upper_bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if upper_bound == float("inf") else repr(upper_bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, bucket_label)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def register_collector(prefix: str, stats_function, counters=()):
+    """
+    Exports a component's existing stats dict at scrape time: keys listed in
+    counters become '<prefix>_<key>_total' counters, other numeric values gauges.
+    """
+    _collectors.append((prefix, stats_function, frozenset(counters)))
+
+
+def _render_collectors():
+    lines = []
+    for prefix, stats_function, counters in _collectors:
+        try:
+            stats = stats_function()
+        except Exception as e:
+            print(f"Metrics collector {prefix} failed: {e}")
+            continue
+        for key, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                name = f"{prefix}_{key}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {value}"]
+            else:
+                name = f"{prefix}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in list(_metrics):
+        lines += metric.render()
+    lines += _render_collectors()
+    return "\n".join(lines) + "\n"
+
+
+# --- Application Metrics ---
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, until the response body is sent.",
+    ("method", "route", "status")
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Time spent in cursor.execute / executemany.", ("operation",)
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Statements that raised an error.", ("operation",)
+)
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds", "Gemini call latency, including retries.", ("operation", "outcome")
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt jobs on the hashing pool, including time queued.", ("operation", "outcome")
+)
+LANGUAGE_DETECTION_DURATION = Histogram(
+    "language_detection_duration_seconds", "Language detection time by the path that answered.", ("path",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+)
+
+
+def statement_operation(query) -> str:
+    """Low-cardinality label for a SQL statement: its first keyword."""
+    if isinstance(query, bytes):
+        query = query[:64].decode("ascii", "ignore")
+    elif not isinstance(query, str):
+        return "other" # psycopg2.sql.Composed and friends
+    keyword = query[:64].lstrip().split(None, 1)
+    return keyword[0].lower() if keyword else "other"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request. Routes are labelled by their
+    path template ('/courses/{course_id}'), so label values stay bounded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        finished = None
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter() # Background tasks that run after the body don't count
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            duration = (finished or time.perf_counter()) - start
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(duration)
@@ -0,0 +1,183 @@
+import argparse
+import importlib.util
+import os
+import time
+import database
+
+# --- Schema Migrations ---
+# Each file in migrations/ is named NNNN_description.py and defines apply(cursor).
+# Files that can't run inside a transaction (CREATE INDEX CONCURRENTLY) set
+# TRANSACTIONAL = False and must be safe to re-run after a partial failure.
+# Applied versions are recorded in schema_version.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_MIGRATION_LOCK_ID = 720401 # pg advisory lock key, so only one worker migrates at a time
+
+
+def load_migrations():
+    """Returns [(version, name, module)] for every migration file, in version order."""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not filename.endswith(".py") or not filename[:4].isdigit():
+            continue
+        name = filename[:-3]
+        spec = importlib.util.spec_from_file_location(f"migrations.{name}", os.path.join(MIGRATIONS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((int(name.split("_", 1)[0]), name, module))
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Two migration files share a version number.")
+    return migrations
+
+
+def migration_versions():
+    """Versions of the migration files, read from their names without importing them."""
+    return {
+        int(filename.split("_", 1)[0]) for filename in os.listdir(MIGRATIONS_DIR)
+        if filename.endswith(".py") and filename[:4].isdigit()
+    }
+
+
+def is_up_to_date() -> bool:
+    """
+    One cheap query: True when every migration file is recorded in
+    schema_version, so startup can skip the migration runner entirely.
+    """
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT version FROM schema_version')
+        applied = {row['version'] for row in cursor.fetchall()}
+        return migration_versions() <= applied
+    except (Exception, database.psycopg2.DatabaseError):
+        conn.rollback() # Most likely no schema_version table yet
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def create_index(cursor, name: str, table: str, columns: str):
+    """
+    Builds an index without blocking writes (CREATE INDEX CONCURRENTLY). An
+    invalid index left by an interrupted build is dropped and rebuilt.
+    """
+    if database._IS_SQLITE:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+        return
+    cursor.execute(
+        'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s',
+        (name,)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        if row['indisvalid']:
+            return
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+def _set_autocommit(conn, enabled: bool):
+    if database._IS_SQLITE:
+        conn.isolation_level = None if enabled else ""
+    else:
+        conn.autocommit = enabled
+
+
+def _acquire_lock(cursor):
+    # Poll rather than block in pg_advisory_lock(): a session waiting inside a
+    # statement would make our CREATE INDEX CONCURRENTLY wait for it in turn.
+    waited = False
+    while True:
+        cursor.execute('SELECT pg_try_advisory_lock(%s) AS locked', (_MIGRATION_LOCK_ID,))
+        if cursor.fetchone()['locked']:
+            return
+        if not waited:
+            print("Another process is migrating the database, waiting...")
+            waited = True
+        time.sleep(1.0)
+
+
+def _ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def applied_versions(cursor):
+    cursor.execute('SELECT version FROM schema_version')
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def run_migrations(target: int = None):
+    """
+    Applies every migration not yet recorded in schema_version (up to target,
+    if given), in order. Returns the names of the migrations applied.
+    """
+    conn = database._connect() # Dedicated connection: autocommit and a session lock
+    cursor = conn.cursor()
+    applied = []
+    try:
+        _set_autocommit(conn, True)
+        if not database._IS_SQLITE:
+            _acquire_lock(cursor)
+        _ensure_version_table(cursor)
+        done = applied_versions(cursor)
+
+        for version, name, module in load_migrations():
+            if version in done or (target is not None and version > target):
+                continue
+            print(f"Applying migration {name}...")
+            start = time.perf_counter()
+            if getattr(module, "TRANSACTIONAL", True):
+                _set_autocommit(conn, False)
+                try:
+                    module.apply(cursor)
+                    cursor.execute('INSERT INTO schema_version (version, name) VALUES (%s, %s)', (version, name))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    _set_autocommit(conn, True)
+            else:
+                module.apply(cursor)
+                cursor.execute('INSERT INTO schema_version (version, name) VALUES (%s, %s)', (version, name))
+            print(f"Applied migration {name} in {time.perf_counter() - start:.2f}s")
+            applied.append(name)
+        return applied
+    finally:
+        cursor.close()
+        conn.close() # Also releases the advisory lock
+
+
+def main():
+    """CLI: python migrate.py [status | up [--to VERSION]]"""
+    parser = argparse.ArgumentParser(description="Apply or inspect database schema migrations.")
+    parser.add_argument("command", nargs="?", choices=["up", "status"], default="up")
+    parser.add_argument("--to", type=int, default=None, help="Stop after this migration version")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        conn = database._connect()
+        cursor = conn.cursor()
+        try:
+            _ensure_version_table(cursor)
+            conn.commit()
+            done = applied_versions(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+        for version, name, _ in load_migrations():
+            print(f"{'applied' if version in done else 'pending'}  {name}")
+        return
+
+    applied = run_migrations(target=args.to)
+    print(f"Applied {len(applied)} migration(s)." if applied else "Database schema is up to date.")
+
+if __name__ == '__main__':
+    main()
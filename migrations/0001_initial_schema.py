@@ -0,0 +1,125 @@
+"""
+Tables as database.create_tables() used to create them. Every statement is
+idempotent, so this also applies cleanly to databases created before migrations.
+"""
+
+
+def apply(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+
+    # Courses Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS courses (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            instructor TEXT NOT NULL
+        )
+    ''')
+
+    # Conversations Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            message TEXT NOT NULL,
+            response TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Internal_marks table 
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS internal_marks (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+            internal_1 INTEGER DEFAULT 0 CHECK (internal_1 >= 0 AND internal_1 <= 25),
+            internal_2 INTEGER DEFAULT 0 CHECK (internal_2 >= 0 AND internal_2 <= 25),
+            internal_3 INTEGER DEFAULT 0 CHECK (internal_3 >= 0 AND internal_3 <= 25),
+            UNIQUE(student_id, course_id) -- A student has only one set of marks per course
+        )
+    ''')
+
+    # Schedules Table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schedules (
+            id SERIAL PRIMARY KEY,
+            course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+            day_of_week TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            location TEXT
+        )
+    ''')
+    
+    # --- NEW Enrollments Table ---
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS enrollments (
+            id SERIAL PRIMARY KEY,
+            student_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+            UNIQUE(student_id, course_id) -- Prevent duplicate enrollments
+        )
+    ''')
+
+    # Conversation_summaries table (rolling summary of turns outside the chat history window)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            summary TEXT NOT NULL,
+            last_conversation_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # FAQs table (indexed in memory by chat/faq.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS faqs (
+            id SERIAL PRIMARY KEY,
+            question TEXT NOT NULL UNIQUE,
+            answer TEXT NOT NULL,
+            keywords TEXT NOT NULL DEFAULT ''
+        )
+    ''')
+
+    cursor.execute('''
+        INSERT INTO faqs (question, answer, keywords)
+        VALUES
+            ('What are the library hours?',
+             'The main library is open from 8 AM to 10 PM on weekdays and 10 AM to 6 PM on weekends.',
+             'library hours open close'),
+            ('When is the admission deadline?',
+             'The admission deadline for the next semester is November 15th. You can find more details on the admissions website.',
+             'admission deadline apply application'),
+            ('How do I get gym access?',
+             'The college gym is available to all students. You need your student ID card for access. Hours are 6 AM to 9 PM daily.',
+             'gym fitness sports access')
+        ON CONFLICT (question) DO NOTHING
+    ''')
+
+    # System_config table 
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS system_config (
+            id SERIAL PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            value TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
+        )
+    ''')
+    # Databases created before config versioning existed
+    cursor.execute('ALTER TABLE system_config ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1')
+
+    cursor.execute('''
+        INSERT INTO system_config (key, value)
+        VALUES ('system_prompt', 'You are a helpful college chatbot.')
+        ON CONFLICT (key) DO NOTHING
+    ''')
@@ -0,0 +1,6 @@
+"""users.year_of_study, used by registration and the current-user lookup."""
+
+
+def apply(cursor):
+    # Nullable with no default, so this is a catalog-only change on large tables
+    cursor.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS year_of_study INTEGER')
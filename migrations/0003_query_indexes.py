@@ -0,0 +1,15 @@
+"""Secondary indexes for the lookups in main.py, built without locking out writes."""
+from migrate import create_index
+
+TRANSACTIONAL = False # CREATE INDEX CONCURRENTLY can't run in a transaction
+
+
+def apply(cursor):
+    # Per-user conversation reads filter on user_id and sort or page by id
+    create_index(cursor, 'idx_conversations_user_id', 'conversations', 'user_id, id')
+    create_index(cursor, 'idx_courses_instructor', 'courses', 'instructor')
+    create_index(cursor, 'idx_users_role', 'users', 'role')
+    create_index(cursor, 'idx_schedules_course_id', 'schedules', 'course_id')
+    create_index(cursor, 'idx_internal_marks_course_id', 'internal_marks', 'course_id')
+    # Course rosters; UNIQUE(student_id, course_id) already covers lookups by student
+    create_index(cursor, 'idx_enrollments_course_id', 'enrollments', 'course_id')
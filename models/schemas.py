@@ -1,6 +1,6 @@
 from pydantic import BaseModel, ConfigDict, conint, computed_field
 from datetime import datetime
-from typing import Optional 
+from typing import Optional, List
 
 # --- User Models ---
 class User(BaseModel):
@@ -8,6 +8,7 @@ class User(BaseModel):
     email: str
     password: str
     role: str
+    year_of_study: Optional[int] = None
 
 class UserDisplay(BaseModel):
     model_config = ConfigDict(from_attributes=True) 
@@ -93,6 +94,26 @@ class EnrollmentCreate(BaseModel):
     student_id: int
     course_id: int
 
+class BulkEnrollmentCreate(BaseModel):
+    student_ids: List[int] = [] # Every student here...
+    course_ids: List[int] = [] # ...is enrolled in every course here
+    pairs: List[EnrollmentCreate] = [] # Plus individual student/course pairs
+
+# --- Report Models ---
+class SummaryBatchRequest(BaseModel):
+    course_id: Optional[int] = None # Every student enrolled in this course...
+    student_ids: List[int] = [] # ...and/or these students
+
+# --- FAQ Models ---
+class FaqCreate(BaseModel):
+    question: str
+    answer: str
+    keywords: str = ""
+
+class Faq(FaqCreate):
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+
 # --- Admin Models (THE MISSING CLASS) ---
 class PromptUpdate(BaseModel):
     prompt: str
@@ -0,0 +1,31 @@
+from decouple import config
+from fastapi import Query
+
+# --- Keyset Pagination ---
+# List endpoints return one page of rows ordered by id. The id to continue from
+# is sent back in the X-Next-Cursor header (absent on the last page), so the
+# response body stays a plain list.
+PAGE_SIZE_DEFAULT = config('PAGE_SIZE_DEFAULT', default=100, cast=int)
+PAGE_SIZE_MAX = config('PAGE_SIZE_MAX', default=500, cast=int)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_size(limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX)) -> int:
+    return limit
+
+
+def like_prefix(text: str) -> str:
+    """ILIKE pattern matching values that start with text (wildcards escaped)."""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+def finish_page(rows, limit: int, response, key: str = "id"):
+    """
+    Trims a result fetched with LIMIT limit + 1 down to one page and sets the
+    next-cursor header when more rows follow.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(rows[-1][key])
+    return rows
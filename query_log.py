@@ -0,0 +1,248 @@
+from collections import deque
+from datetime import datetime
+from decouple import config
+from functools import lru_cache
+import psycopg2
+import queue
+import re
+import threading
+import time
+import tracing
+
+# --- Query Log ---
+# Every statement run through a pooled cursor (database.TimedCursor) is
+# recorded here under its normalized text, with literals and placeholders
+# replaced by '?'. Statements slower than SLOW_QUERY_MS are logged, and their
+# plan is captured with EXPLAIN on a background thread with its own
+# connection, so the request that ran the slow query never waits for it.
+# EXPLAIN ANALYZE runs the statement again, so it is only used for read-only
+# statements. Writes get a plain EXPLAIN, and each statement is explained at
+# most once per SLOW_QUERY_EXPLAIN_INTERVAL.
+QUERY_LOG_ENABLED = config('QUERY_LOG_ENABLED', default=True, cast=bool)
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=200.0, cast=float)
+SLOW_QUERY_EXPLAIN = config('SLOW_QUERY_EXPLAIN', default=True, cast=bool)
+SLOW_QUERY_EXPLAIN_INTERVAL = config('SLOW_QUERY_EXPLAIN_INTERVAL', default=300.0, cast=float) # Seconds, per statement
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = config('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', default=30000, cast=int)
+SLOW_QUERY_HISTORY = config('SLOW_QUERY_HISTORY', default=100, cast=int) # Recent slow queries kept for /admin/slow-queries
+QUERY_LOG_MAX_STATEMENTS = config('QUERY_LOG_MAX_STATEMENTS', default=1000, cast=int) # Distinct statements tracked
+
+_STATEMENT_TEXT_LIMIT = 2048 # execute_values batches can be huge; their prefix identifies them
+_OVERFLOW_STATEMENT = "(other statements)"
+_EXPLAINABLE = {"select", "with", "insert", "update", "delete"}
+# Statements with side effects, which EXPLAIN ANALYZE would repeat (FOR UPDATE also takes locks)
+_SIDE_EFFECTS = re.compile(r"\b(insert|update|delete|merge|nextval|setval|pg_\w*advisory\w*)\b", re.IGNORECASE)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_REPEATED_VALUE_LISTS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_statements = {} # normalized statement -> stats
+_recent_slow = deque(maxlen=SLOW_QUERY_HISTORY)
+_last_explained = {} # normalized statement -> monotonic time of its last EXPLAIN
+_counters = {"slow_queries": 0, "explained": 0, "explain_failed": 0, "explain_dropped": 0}
+
+
+def normalize(query) -> str:
+    """Statement text with literals and placeholders replaced, for grouping."""
+    if isinstance(query, bytes):
+        query = query[:_STATEMENT_TEXT_LIMIT].decode("utf-8", "replace")
+    elif not isinstance(query, str):
+        query = str(query) # psycopg2.sql.Composed and friends
+    return _normalize_text(query[:_STATEMENT_TEXT_LIMIT])
+
+
+@lru_cache(maxsize=1024) # Most statements are string constants, so this is nearly always a hit
+def _normalize_text(query: str) -> str:
+    text = _WHITESPACE.sub(" ", query).strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _VALUE_LIST.sub("(...)", text)
+    return _REPEATED_VALUE_LISTS.sub("(...), ...", text)
+
+
+def record(raw_cursor, query, params, seconds: float, failed: bool, many: bool = False):
+    """Called by database.TimedCursor after each execute / executemany."""
+    if not QUERY_LOG_ENABLED:
+        return
+    statement = normalize(query)
+    rows = raw_cursor.rowcount if not failed and raw_cursor.rowcount is not None else -1
+    duration_ms = seconds * 1000
+    slow = duration_ms >= SLOW_QUERY_MS
+    with _lock:
+        stats = _statements.get(statement)
+        if stats is None:
+            if len(_statements) >= QUERY_LOG_MAX_STATEMENTS:
+                statement = _OVERFLOW_STATEMENT
+                stats = _statements.get(statement)
+            if stats is None:
+                stats = _statements[statement] = {
+                    "calls": 0, "errors": 0, "slow": 0, "rows": 0, "total_ms": 0.0, "max_ms": 0.0
+                }
+        stats["calls"] += 1
+        stats["errors"] += int(failed)
+        stats["total_ms"] += duration_ms
+        stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        if rows > 0:
+            stats["rows"] += rows
+        if not slow:
+            return
+        stats["slow"] += 1
+        _counters["slow_queries"] += 1
+        entry = {
+            "statement": statement,
+            "duration_ms": round(duration_ms, 3),
+            "rows": rows,
+            "failed": failed,
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "trace_id": tracing.current_trace_id(),
+            "plan": None,
+        }
+        _recent_slow.append(entry)
+        explain_due = _explain_due(statement)
+
+    print(f"Slow query ({duration_ms:.0f} ms, {rows} rows, trace {entry['trace_id']}): {statement}")
+    if explain_due and not many: # An executemany batch has no single plan
+        _queue_explain(raw_cursor, query, params, entry)
+
+
+def _explain_due(statement: str) -> bool:
+    """Call with _lock held."""
+    if not SLOW_QUERY_EXPLAIN or statement == _OVERFLOW_STATEMENT:
+        return False
+    now = time.monotonic()
+    last = _last_explained.get(statement)
+    if last is not None and now - last < SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    _last_explained[statement] = now
+    if len(_last_explained) > QUERY_LOG_MAX_STATEMENTS:
+        _last_explained.pop(next(iter(_last_explained)))
+    return True
+
+
+def _queue_explain(raw_cursor, query, params, entry: dict):
+    if not hasattr(raw_cursor, "mogrify"): # SQLite: no mogrify, and a different EXPLAIN
+        return
+    keyword = entry["statement"].split(" ", 1)[0].lower()
+    if keyword not in _EXPLAINABLE:
+        return
+    try:
+        # Bound on the request's cursor so the literals are quoted exactly as they were sent
+        statement = raw_cursor.mogrify(query, params)
+    except Exception as e:
+        print(f"Could not prepare EXPLAIN for slow query: {e}")
+        return
+    read_only = keyword in ("select", "with") and not _SIDE_EFFECTS.search(entry["statement"])
+    explainer.submit(statement, read_only, entry)
+
+
+class Explainer:
+    """Runs EXPLAIN for slow queries on a background thread with a dedicated connection."""
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=32)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None
+
+    def submit(self, statement: bytes, read_only: bool, entry: dict):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((statement, read_only, entry))
+        except queue.Full:
+            with _lock:
+                _counters["explain_dropped"] += 1
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="query-explainer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            self._explain(*job)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _explain(self, statement: bytes, read_only: bool, entry: dict):
+        import database # Imported here: database imports this module
+        options = b"(ANALYZE, BUFFERS)" if read_only else b""
+        cursor = None
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = database._connect() # Not pooled, so EXPLAINs aren't recorded themselves
+            cursor = self._conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            cursor.execute("SET LOCAL statement_timeout = %s", (SLOW_QUERY_EXPLAIN_TIMEOUT_MS,))
+            cursor.execute(b"EXPLAIN " + options + b" " + statement)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            with _lock:
+                entry["plan"] = plan
+                _counters["explained"] += 1
+            print(f"Plan for slow query ({entry['duration_ms']:.0f} ms): {entry['statement']}\n{plan}")
+        except (Exception, psycopg2.DatabaseError) as error:
+            print(f"EXPLAIN failed for slow query: {error}")
+            with _lock:
+                _counters["explain_failed"] += 1
+        finally:
+            if cursor: cursor.close()
+            if self._conn is not None and not self._conn.closed:
+                self._conn.rollback() # Never keep what an EXPLAIN ANALYZE did
+
+
+explainer = Explainer()
+
+
+_ORDERINGS = {
+    "total": lambda stats: stats["total_ms"],
+    "mean": lambda stats: stats["total_ms"] / stats["calls"],
+    "max": lambda stats: stats["max_ms"],
+    "calls": lambda stats: stats["calls"],
+}
+
+
+def top_statements(limit: int = 20, order_by: str = "total"):
+    """The `limit` statements with the highest total, mean or max time, or the most calls."""
+    key = _ORDERINGS[order_by]
+    with _lock:
+        ranked = sorted(_statements.items(), key=lambda item: key(item[1]), reverse=True)[:limit]
+        return [
+            {
+                "statement": statement, **stats,
+                "total_ms": round(stats["total_ms"], 3),
+                "mean_ms": round(stats["total_ms"] / stats["calls"], 3),
+                "max_ms": round(stats["max_ms"], 3),
+            }
+            for statement, stats in ranked
+        ]
+
+
+def recent_slow_queries():
+    with _lock:
+        return [dict(entry) for entry in reversed(_recent_slow)]
+
+
+def stats():
+    with _lock:
+        return {**_counters, "statements": len(_statements), "slow_query_ms": SLOW_QUERY_MS}
+
+
+def reset():
+    with _lock:
+        _statements.clear()
+        _recent_slow.clear()
+        _last_explained.clear()
@@ -0,0 +1,218 @@
+from cachetools import TTLCache
+from decouple import config
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+import llm
+
+# --- Student Summary Settings ---
+SUMMARY_CACHE_SIZE = config('SUMMARY_CACHE_SIZE', default=2048, cast=int)
+SUMMARY_CACHE_TTL = config('SUMMARY_CACHE_TTL', default=86400, cast=int) # Seconds
+SUMMARY_RECENT_CHATS = config('SUMMARY_RECENT_CHATS', default=10, cast=int)
+SUMMARY_CHAT_MAX_CHARS = config('SUMMARY_CHAT_MAX_CHARS', default=200, cast=int) # Per message/response in the prompt
+
+SUMMARY_PROMPT_TEMPLATE = """You are an academic advisor. Analyze the following student's data and provide a 3-4 sentence professional summary of their academic progress, engagement, and any potential areas of concern.
+
+STUDENT: {name} <{email}>
+
+ENROLLED COURSES:
+{enrollments}
+
+INTERNAL MARKS (I1/I2/I3 out of 25 each, total out of 75):
+{marks}
+
+RECENT CHATBOT ENGAGEMENT (User -> Bot):
+{chats}
+
+SUMMARY:"""
+
+# Everything a summary needs, for many students in one round-trip
+_STUDENT_DATA_QUERY = '''
+    SELECT
+        u.id, u.name, u.email,
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'course_name', c.name, 'internal_1', m.internal_1,
+                'internal_2', m.internal_2, 'internal_3', m.internal_3
+            ) ORDER BY c.name)
+            FROM internal_marks m JOIN courses c ON m.course_id = c.id
+            WHERE m.student_id = u.id
+        ), '[]') as marks,
+        COALESCE((
+            SELECT json_agg(json_build_object('course_name', c.name, 'instructor', c.instructor) ORDER BY c.name)
+            FROM enrollments e JOIN courses c ON e.course_id = c.id
+            WHERE e.student_id = u.id
+        ), '[]') as enrollments,
+        COALESCE((
+            SELECT json_agg(json_build_object('message', t.message, 'response', t.response) ORDER BY t.id)
+            FROM (
+                SELECT id, message, response FROM conversations
+                WHERE user_id = u.id ORDER BY id DESC LIMIT %s
+            ) t
+        ), '[]') as recent_chats
+    FROM users u
+    WHERE u.id = ANY(%s) AND u.role = 'student'
+'''
+
+
+def fetch_students_data(cursor, student_ids):
+    """Returns {student_id: data} for the given students (non-students are skipped)."""
+    cursor.execute(_STUDENT_DATA_QUERY, (SUMMARY_RECENT_CHATS, list(student_ids)))
+    return {row['id']: dict(row) for row in cursor.fetchall()}
+
+
+def _clip(text: str) -> str:
+    return text if len(text) <= SUMMARY_CHAT_MAX_CHARS else text[:SUMMARY_CHAT_MAX_CHARS] + "..."
+
+
+def build_prompt(data: dict) -> str:
+    enrollments = "\n".join(
+        f"- {course['course_name']} ({course['instructor']})" for course in data['enrollments']
+    ) or "- Not enrolled in any courses."
+    marks = "\n".join(
+        f"- {mark['course_name']}: {mark['internal_1']}/{mark['internal_2']}/{mark['internal_3']}, "
+        f"total {mark['internal_1'] + mark['internal_2'] + mark['internal_3']}"
+        for mark in data['marks']
+    ) or "- No marks recorded."
+    chats = "\n".join(
+        f"- \"{_clip(chat['message'])}\" -> \"{_clip(chat['response'])}\"" for chat in data['recent_chats']
+    ) or "- No recent chat history."
+    return SUMMARY_PROMPT_TEMPLATE.format(
+        name=data['name'], email=data['email'], enrollments=enrollments, marks=marks, chats=chats
+    )
+
+
+def fingerprint(data: dict) -> str:
+    """Hash of the data a summary is built from; changes whenever the summary would."""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- Summary Cache ---
+_summary_cache = TTLCache(maxsize=SUMMARY_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+_summary_cache_lock = threading.Lock()
+
+def get_cached_summary(student_id: int, data_fingerprint: str):
+    with _summary_cache_lock:
+        return _summary_cache.get((student_id, data_fingerprint))
+
+def cache_summary(student_id: int, data_fingerprint: str, summary: str):
+    with _summary_cache_lock:
+        _summary_cache[(student_id, data_fingerprint)] = summary
+
+
+# --- Batch Summary Jobs ---
+# Jobs live in the worker process that created them, so polling and streaming
+# must reach the same worker (sticky sessions when running several).
+SUMMARY_BATCH_CONCURRENCY = config('SUMMARY_BATCH_CONCURRENCY', default=8, cast=int) # Parallel LLM calls per job
+SUMMARY_BATCH_MAX_STUDENTS = config('SUMMARY_BATCH_MAX_STUDENTS', default=2000, cast=int)
+SUMMARY_FETCH_CHUNK = 500 # Students loaded per query
+SUMMARY_JOB_TTL = 3600 # Seconds a finished job is kept for polling
+
+
+class SummaryJob:
+    def __init__(self, student_ids):
+        self.id = uuid.uuid4().hex
+        self.student_ids = student_ids
+        self.status = "pending"
+        self.error = None
+        self.results = [] # In completion order
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    def snapshot(self, since: int = 0):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total": len(self.student_ids),
+            "completed": len(self.results),
+            "results": self.results[since:],
+        }
+
+    async def _publish(self, result: dict):
+        async with self._changed:
+            self.results.append(result)
+            self._changed.notify_all()
+
+    async def _finish(self, status: str, error: str = None):
+        async with self._changed:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def follow(self):
+        """Yields each result as it completes, until the job finishes."""
+        sent = 0
+        while True:
+            async with self._changed:
+                while sent == len(self.results) and self.finished_at is None:
+                    await self._changed.wait()
+                pending = self.results[sent:]
+                finished = self.finished_at is not None
+            for result in pending:
+                yield result
+            sent += len(pending)
+            if finished and sent == len(self.results):
+                return
+
+
+async def _run_job(job: SummaryJob, load_students_data):
+    job.status = "running"
+    worker_limit = asyncio.Semaphore(SUMMARY_BATCH_CONCURRENCY)
+
+    async def summarize(student_id, data):
+        if data is None:
+            await job._publish({"student_id": student_id, "error": "Student not found."})
+            return
+        data_fingerprint = fingerprint(data)
+        summary = get_cached_summary(student_id, data_fingerprint)
+        cached = summary is not None
+        if not cached:
+            try:
+                async with worker_limit:
+                    summary = await llm.generate(build_prompt(data))
+            except Exception as e:
+                print(f"Google Gemini API error (batch summary, student {student_id}): {e}")
+                await job._publish({"student_id": student_id, "name": data['name'], "error": "Error connecting to AI service."})
+                return
+            cache_summary(student_id, data_fingerprint, summary)
+        await job._publish({"student_id": student_id, "name": data['name'], "summary": summary, "cached": cached})
+
+    try:
+        for start in range(0, len(job.student_ids), SUMMARY_FETCH_CHUNK):
+            chunk = job.student_ids[start:start + SUMMARY_FETCH_CHUNK]
+            data_by_id = await run_in_threadpool(load_students_data, chunk)
+            await asyncio.gather(*(summarize(student_id, data_by_id.get(student_id)) for student_id in chunk))
+        await job._finish("completed")
+    except Exception as e:
+        print(f"Error running summary job {job.id}: {e}")
+        await job._finish("failed", "Error generating summaries.")
+
+
+_jobs = {} # job id -> SummaryJob
+
+def start_summary_job(student_ids, load_students_data) -> SummaryJob:
+    """
+    Starts summarising the given students in the background. load_students_data
+    is a blocking callable taking a list of ids and returning fetch_students_data()'s result.
+    """
+    now = time.time()
+    for job_id, old_job in list(_jobs.items()):
+        if old_job.finished_at is not None and now - old_job.finished_at > SUMMARY_JOB_TTL:
+            del _jobs[job_id]
+
+    job = SummaryJob(student_ids)
+    _jobs[job.id] = job
+    job.task = asyncio.create_task(_run_job(job, load_students_data))
+    return job
+
+def get_summary_job(job_id: str):
+    return _jobs.get(job_id)
@@ -0,0 +1,342 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decouple import config
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+
+# --- Request Tracing ---
+# Every HTTP request gets a trace id (returned in X-Trace-Id) and a root span;
+# span() adds child spans for the stages inside it (auth, DB, LLM, ...). Spans
+# are always collected in memory, but a trace is only exported when it was
+# sampled, was slower than TRACE_SLOW_SECONDS or failed, so the tail-latency
+# requests are kept without writing out every request.
+TRACING_ENABLED = config('TRACING_ENABLED', default=True, cast=bool)
+TRACE_SAMPLE_RATE = config('TRACE_SAMPLE_RATE', default=0.01, cast=float)
+TRACE_SLOW_SECONDS = config('TRACE_SLOW_SECONDS', default=2.0, cast=float)
+TRACE_EXPORTER = config('TRACE_EXPORTER', default='jsonl') # 'jsonl' or 'otlp'
+TRACE_EXPORT_PATH = config('TRACE_EXPORT_PATH', default='traces.jsonl')
+TRACE_EXPORT_MAX_BYTES = config('TRACE_EXPORT_MAX_BYTES', default=50 * 1024 * 1024, cast=int) # Then rotated to .1, .2, ...
+TRACE_EXPORT_BACKUPS = config('TRACE_EXPORT_BACKUPS', default=3, cast=int)
+# Honour the sampled flag of an incoming traceparent header. Only enable this
+# behind a proxy that sets the header itself: any client can send one.
+TRACE_TRUST_UPSTREAM_SAMPLED = config('TRACE_TRUST_UPSTREAM_SAMPLED', default=False, cast=bool)
+TRACE_OTLP_ENDPOINT = config('TRACE_OTLP_ENDPOINT', default='http://localhost:4318/v1/traces') # OTLP/HTTP JSON
+TRACE_EXPORT_QUEUE_SIZE = config('TRACE_EXPORT_QUEUE_SIZE', default=1000, cast=int) # Traces beyond this are dropped
+TRACE_MAX_SPANS = config('TRACE_MAX_SPANS', default=500, cast=int) # Per trace, so a loop can't grow one without bound
+SERVICE_NAME = "college-chatbot-backend"
+
+_current_trace = ContextVar("current_trace", default=None)
+_current_span = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    # Most traces are never exported, so a span is kept cheap: its id is only
+    # generated when the trace is (see _trace_record)
+    __slots__ = ("span_id", "parent", "name", "attributes", "start_ns", "end_ns", "error")
+
+    def __init__(self, name: str, parent, attributes: dict):
+        self.span_id = None
+        self.parent = parent
+        self.name = name
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock() # Spans are added from threadpool workers too
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped_spans += 1
+
+
+def current_trace_id():
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def annotate(**attributes):
+    """Adds attributes to the current span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times a stage as a child of the current span. Does nothing outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    trace.add(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+# --- Export ---
+def _trace_record(trace: Trace, reason: str) -> dict:
+    for s in trace.spans:
+        if s.span_id is None:
+            s.span_id = _new_id(64)
+    root = trace.spans[0]
+    return {
+        "traceId": trace.trace_id,
+        "reason": reason,
+        "name": root.name,
+        "durationMs": round(root.duration_ms, 3),
+        "droppedSpans": trace.dropped_spans,
+        "spans": [
+            {
+                "spanId": s.span_id,
+                "parentSpanId": s.parent.span_id if s.parent is not None else None,
+                "name": s.name,
+                "startTimeUnixNano": s.start_ns,
+                "endTimeUnixNano": s.end_ns or s.start_ns,
+                "durationMs": round(s.duration_ms, 3),
+                "attributes": s.attributes,
+                "error": s.error,
+            }
+            for s in trace.spans
+        ],
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_payload(records):
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for a batch of trace records."""
+    spans = []
+    for record in records:
+        for s in record["spans"]:
+            attributes = dict(s["attributes"])
+            if s["error"]:
+                attributes["error.type"] = s["error"]
+            spans.append({
+                "traceId": record["traceId"],
+                "spanId": s["spanId"],
+                "parentSpanId": s["parentSpanId"] or "",
+                "name": s["name"],
+                "kind": 2 if s["parentSpanId"] is None else 1, # SERVER for the root, INTERNAL otherwise
+                "startTimeUnixNano": str(s["startTimeUnixNano"]),
+                "endTimeUnixNano": str(s["endTimeUnixNano"]),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()],
+                "status": {"code": 2 if s["error"] else 1},
+            })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+    }]}
+
+
+class TraceExporter:
+    """Writes finished traces from a background thread, so requests never wait on I/O."""
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=TRACE_EXPORT_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"exported": 0, "dropped": 0, "failed": 0}
+
+    def submit(self, record: dict):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "pending": self._queue.qsize()}
+
+    def flush(self, timeout: float = 5.0):
+        """Exports whatever is queued (used on shutdown)."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            batch = [] if record is None else [record]
+            stopping = record is None
+            while not stopping and len(batch) < 100:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append(record)
+            if batch:
+                self._export(batch)
+            if stopping:
+                return
+
+    def _export(self, batch):
+        try:
+            if TRACE_EXPORTER == "otlp":
+                request = urllib.request.Request(
+                    TRACE_OTLP_ENDPOINT, data=json.dumps(_otlp_payload(batch)).encode("utf-8"),
+                    headers={"Content-Type": "application/json"}, method="POST"
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                _rotate_if_needed()
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    for record in batch:
+                        f.write(json.dumps(record, default=str) + "\n")
+            with self._lock:
+                self._stats["exported"] += len(batch)
+        except Exception as e:
+            print(f"Trace export failed ({len(batch)} traces): {e}")
+            with self._lock:
+                self._stats["failed"] += len(batch)
+
+
+def _rotate_if_needed():
+    """Keeps the JSONL file under TRACE_EXPORT_MAX_BYTES, with TRACE_EXPORT_BACKUPS old files."""
+    try:
+        if os.path.getsize(TRACE_EXPORT_PATH) < TRACE_EXPORT_MAX_BYTES:
+            return
+    except OSError: # Not written yet
+        return
+    for index in range(TRACE_EXPORT_BACKUPS - 1, 0, -1):
+        older = f"{TRACE_EXPORT_PATH}.{index}"
+        if os.path.exists(older):
+            os.replace(older, f"{TRACE_EXPORT_PATH}.{index + 1}")
+    if TRACE_EXPORT_BACKUPS > 0:
+        os.replace(TRACE_EXPORT_PATH, f"{TRACE_EXPORT_PATH}.1")
+    else:
+        os.remove(TRACE_EXPORT_PATH)
+
+
+exporter = TraceExporter()
+
+
+_TRACEPARENT = re.compile(r"[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-([0-9a-f]{2})")
+_INVALID_TRACE_ID = "0" * 32
+
+
+def _incoming_trace_id(scope):
+    """
+    (trace id, sampled flag) from a W3C traceparent header, so traces can join
+    an upstream one. The flag is only trusted with TRACE_TRUST_UPSTREAM_SAMPLED.
+    Malformed headers are ignored: the id is echoed in X-Trace-Id and exported.
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"traceparent":
+            match = _TRACEPARENT.fullmatch(value.decode("latin-1"))
+            if match and match.group(1) != _INVALID_TRACE_ID:
+                sampled = bool(int(match.group(2), 16) & 0x01) # Bit 0 of trace-flags
+                return match.group(1), TRACE_TRUST_UPSTREAM_SAMPLED and sampled
+            break
+    return None, False
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a trace per HTTP request and exports it when finished."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id, upstream_sampled = _incoming_trace_id(scope)
+        trace = Trace(trace_id or _new_id(128), upstream_sampled or random.random() < TRACE_SAMPLE_RATE)
+        root = Span(f"{scope['method']} {scope['path']}", None, {"http.method": scope["method"]})
+        trace.add(root)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        trace_id_header = (b"x-trace-id", trace.trace_id.encode("ascii"))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                root.set("http.status_code", message["status"])
+                message["headers"] = list(message.get("headers", [])) + [trace_id_header]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                root.end() # Background tasks that run after the body don't count
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            root.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            root.end()
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                root.name = f"{scope['method']} {route}"
+            failed = root.error is not None or root.attributes.get("http.status_code", 500) >= 500
+            if trace.sampled:
+                reason = "sampled"
+            elif failed:
+                reason = "error"
+            elif root.duration_ms >= TRACE_SLOW_SECONDS * 1000:
+                reason = "slow"
+            else:
+                reason = None
+            if reason:
+                exporter.submit(_trace_record(trace, reason))